@@ -0,0 +1,62 @@
+"""Fleet-wide agent performance computed only from the rollup tables (see schema_migrations).
+
+Latency percentiles come from the per-day latency histograms, so they are bucket upper bounds
+rather than exact values; the page stays the same cost however long the step history grows.
+"""
+
+import pandas as pd
+
+from schema_migrations import LATENCY_BUCKET_BOUNDS, SCORE_BUCKETS
+
+
+def percentile_from_histogram(buckets, p):
+    """Upper bound (seconds) of the latency bucket holding the p-th quantile; inf for the open bucket."""
+    total = sum(buckets.values())
+    if not total:
+        return None
+    seen = 0
+    for bucket in sorted(buckets):
+        seen += buckets[bucket]
+        if seen >= p * total:
+            return LATENCY_BUCKET_BOUNDS[bucket] if bucket < len(LATENCY_BUCKET_BOUNDS) else float('inf')
+    return float('inf')
+
+
+def load_fleet_performance(conn, since_day=None):
+    """Per-agent jobs, failure rate, mean/p50/p95 latency and mean score since `since_day` (YYYY-MM-DD)."""
+    where, params = ("WHERE day >= ?", (since_day,)) if since_day else ("", ())
+    totals = pd.read_sql_query(
+        f"""
+        SELECT agent, SUM(jobs) AS jobs, SUM(failures) AS failures, SUM(total_time) AS total_time,
+               SUM(score_sum) AS score_sum, SUM(score_count) AS score_count
+        FROM AgentRollupDaily {where}
+        GROUP BY agent
+        ORDER BY agent
+        """,
+        conn,
+        params=params,
+    )
+    latency = {}
+    for agent, bucket, steps in conn.execute(
+        f"SELECT agent, bucket, SUM(steps) FROM AgentLatencyHistogram {where} GROUP BY agent, bucket", params
+    ):
+        latency.setdefault(agent, {})[bucket] = steps
+
+    totals['failure_rate'] = (totals['failures'] / totals['jobs']).round(3)
+    totals['mean_time'] = (totals['total_time'] / totals['jobs']).round(2)
+    totals['p50_time'] = totals['agent'].map(lambda agent: percentile_from_histogram(latency.get(agent, {}), 0.5))
+    totals['p95_time'] = totals['agent'].map(lambda agent: percentile_from_histogram(latency.get(agent, {}), 0.95))
+    totals['mean_score'] = (totals['score_sum'] / totals['score_count'].where(totals['score_count'] > 0)).round(2)
+    return totals
+
+
+def load_score_distribution(conn, since_day=None):
+    """Number of scored steps per agent and score bucket (tenths of the 0-1 range), one column per agent."""
+    where, params = ("WHERE day >= ?", (since_day,)) if since_day else ("", ())
+    df = pd.read_sql_query(
+        f"SELECT agent, bucket, SUM(steps) AS steps FROM AgentScoreHistogram {where} GROUP BY agent, bucket",
+        conn,
+        params=params,
+    )
+    distribution = df.pivot(index='bucket', columns='agent', values='steps')
+    return distribution.reindex(range(SCORE_BUCKETS + 1)).fillna(0).astype(int)
@@ -0,0 +1,45 @@
+"""Async access to the SQLite databases for the NiceGUI page handlers.
+
+Queries run on a small thread pool instead of the event loop, so one slow page does not stall
+every other connected user. Each worker thread keeps its connections open between queries,
+which makes the pool of workers a pool of connections as well.
+"""
+
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Number of worker threads, and so of open connections per database
+DB_WORKERS = 4
+
+_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix='kyc-db')
+_local = threading.local()
+
+
+def connection(db_path):
+    """Connection of the current worker thread to `db_path`, opened on first use."""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    if db_path not in connections:
+        connections[db_path] = sqlite3.connect(db_path)
+    return connections[db_path]
+
+
+async def run(func, *args):
+    """Run a blocking `func(*args)` on the database thread pool and return its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, lambda: func(*args))
+
+
+async def with_connection(db_path, func, *args):
+    """Run `func(conn, *args)` on the thread pool with that thread's pooled connection."""
+    return await run(lambda: func(connection(db_path), *args))
+
+
+async def read_sql(db_path, query, params=()):
+    """Async `pd.read_sql_query` over a pooled connection."""
+    return await with_connection(db_path, lambda conn: pd.read_sql_query(query, conn, params=params))
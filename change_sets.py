@@ -0,0 +1,149 @@
+"""Book-wide field-level diff of current client profiles against newly extracted data."""
+
+import sqlite3
+import time
+
+import pandas as pd
+
+from utils.config import DB_PATH
+from materiality import (
+    IGNORED_COLUMNS, LATEST_REFRESH_SQL, MEMBER_COLUMNS, MEMBER_NAME_COLUMNS,
+    document_names, load_materiality_rules, member_keys, normalize_values, seed_materiality_rules,
+)
+from schema_migrations import migrate
+
+CHANGE_SET_TABLE = "ClientChangeSet"
+
+
+def load_profiles(conn):
+    """Load the current profile of every client and the extracted data, as long (client, column, value) frames.
+
+    A client's current profile is the rows of its latest refresh (materiality.LATEST_REFRESH_SQL)
+    when it has been refreshed before, otherwise its OnboardingData rows. A client's extracted data
+    is the ExtractedData rows of its extracted_data document, matched on document_name as in materiality.assess_materiality.
+    """
+    onboarding = pd.read_sql_query("SELECT * FROM OnboardingData", conn)
+    refresh = pd.read_sql_query(LATEST_REFRESH_SQL, conn)
+    extracted = pd.read_sql_query("SELECT * FROM ExtractedData", conn).drop(columns=['client_identifier'], errors='ignore')
+
+    documents = onboarding.loc[onboarding['extracted_data'].notna(), ['client_identifier', 'extracted_data']]
+    links = documents.assign(document_name=documents['extracted_data'].map(document_names)).explode('document_name')
+    links = links[['client_identifier', 'document_name']].drop_duplicates()
+    unmatched = sorted(set(extracted['document_name'].dropna()) - set(links['document_name']))
+    if unmatched:
+        print(f"Warning: {len(unmatched)} extracted documents are not the extracted_data of any client: {unmatched}")
+    extracted = extracted.merge(links, on='document_name')
+
+    onboarding = onboarding[~onboarding['client_identifier'].isin(refresh['client_identifier'])]
+    current = pd.concat([refresh, onboarding], ignore_index=True)
+
+    columns = [
+        col for col in extracted.columns
+        if col in current.columns and col not in IGNORED_COLUMNS
+    ]
+    return to_long(current, columns), to_long(extracted, columns)
+
+
+def to_long(df, columns):
+    """Melt a wide frame into unique (client_identifier, column_name, member, value) rows with normalized values.
+
+    `member` is the member key of member columns (see materiality.member_keys), empty for client columns.
+    """
+    long = df[['client_identifier'] + columns].assign(member=member_keys(df)).melt(
+        id_vars=['client_identifier', 'member'], var_name='column_name', value_name='raw_value'
+    )
+    long['client_identifier'] = long['client_identifier'].astype(str)
+    long.loc[~long['column_name'].isin(MEMBER_COLUMNS), 'member'] = ''
+    long['value'] = normalize_values(long['raw_value'])
+    long = long[long['value'] != '']
+    return long.drop_duplicates(['client_identifier', 'column_name', 'member', 'value'])
+
+
+def labels(changed, suffix):
+    """'member: value' display labels of the old or new raw values of changed rows."""
+    raw = changed[f'raw_value_{suffix}']
+    label = raw.where(
+        (changed['member'] == '') | changed['member'].eq(changed['value']),
+        changed['member'] + ': ' + raw.astype(str),
+    )
+    return label.where(raw.notna())
+
+
+def compute_change_sets(current, extracted, rules):
+    """Return one row per changed (client_identifier, column_name) with old/new values and materiality.
+
+    Member columns are compared per member key and client columns as sets of values per client,
+    so member rows can come in any order but two members swapping an attribute is a change.
+    Columns, or member attributes, the extracted data leaves empty are treated as not provided.
+    """
+    keys = ['client_identifier', 'column_name']
+    # Only compare the columns the extracted data actually provides for each client
+    provided = extracted[keys].drop_duplicates()
+    current = current.merge(provided, on=keys)
+    # Member attributes only for the members given them; member names also cover removed members
+    attributes = MEMBER_COLUMNS - set(MEMBER_NAME_COLUMNS)
+    provided_members = extracted.loc[extracted['column_name'].isin(attributes), keys + ['member']].drop_duplicates()
+    is_attribute = current['column_name'].isin(attributes)
+    current = pd.concat(
+        [current[~is_attribute], current[is_attribute].merge(provided_members, on=keys + ['member'])],
+        ignore_index=True,
+    )
+
+    merged = current[keys + ['member', 'value', 'raw_value']].merge(
+        extracted[keys + ['member', 'value', 'raw_value']],
+        on=keys + ['member', 'value'],
+        how='outer',
+        suffixes=('_old', '_new'),
+        indicator=True,
+    )
+    differing = merged.loc[merged['_merge'] != 'both', keys].drop_duplicates()
+    if differing.empty:
+        return pd.DataFrame(columns=keys + ['old_value', 'new_value', 'is_material'])
+
+    changed = merged.merge(differing, on=keys)
+    changed = changed.assign(old_label=labels(changed, 'old'), new_label=labels(changed, 'new'))
+    values = changed.groupby(keys).agg(
+        old_value=('old_label', lambda v: ' | '.join(sorted(v.dropna().astype(str)))),
+        new_value=('new_label', lambda v: ' | '.join(sorted(v.dropna().astype(str)))),
+    ).reset_index()
+    values['is_material'] = values['column_name'].map(rules).astype('Int64')
+    return values
+
+
+def summarize_change_sets(change_sets, client_identifiers):
+    """Count changes per client and derive the triage verdict used by the materiality fast path."""
+    counts = change_sets.assign(
+        material=change_sets['is_material'].eq(1).fillna(False),
+        non_material=change_sets['is_material'].eq(0).fillna(False),
+        unclassified=change_sets['is_material'].isna(),
+    ).groupby('client_identifier')[['material', 'non_material', 'unclassified']].sum()
+    summary = counts.reindex(pd.Index(client_identifiers, name='client_identifier'), fill_value=0).astype(int)
+    summary['verdict'] = 'no_change'
+    summary.loc[summary['non_material'] > 0, 'verdict'] = 'non_material'
+    summary.loc[summary['material'] > 0, 'verdict'] = 'material'
+    summary.loc[summary['unclassified'] > 0, 'verdict'] = 'undetermined'
+    return summary.reset_index()
+
+
+def build_change_sets(db_path=DB_PATH):
+    """Recompute the change sets of the whole book, store them and return the per-client summary."""
+    with sqlite3.connect(db_path) as conn:
+        seed_materiality_rules(conn)
+        rules = load_materiality_rules(conn)
+        current, extracted = load_profiles(conn)
+        change_sets = compute_change_sets(current, extracted, rules)
+        change_sets['computed_at'] = time.time()
+
+        conn.execute(f"DELETE FROM {CHANGE_SET_TABLE}")
+        change_sets.to_sql(CHANGE_SET_TABLE, conn, if_exists='append', index=False)
+
+    return summarize_change_sets(change_sets, extracted['client_identifier'].unique())
+
+
+if __name__ == "__main__":
+    migrate(DB_PATH)
+    t0 = time.time()
+    summary = build_change_sets()
+    print(summary.to_string(index=False))
+    print(f"\n{len(summary)} clients diffed in {time.time() - t0:.2f} sec")
+    print(summary['verdict'].value_counts().to_string())
@@ -0,0 +1,167 @@
+"""View model of the /client/{client_id} page, loaded in one pass over one connection.
+
+Details are cached per client and dropped when DashboardChangeLog records a change for that
+client, which happens when a workflow completes (its agent log row and refresh update).
+"""
+
+import threading
+
+import pandas as pd
+
+import async_db
+from dashboard_cache import read_changes
+
+# (step, agent) whose result is shown as the profile scan hit details
+SCAN_PROFILES_STEP = ("Scan Profiles", "Screening Agent")
+# Oldest cached details are dropped beyond this many entries
+CLIENT_DETAIL_CACHE_MAX_ENTRIES = 1000
+
+MISSING_REFRESH_DATA = {
+    'entity_legal_name': 'N/A',
+    'client_identifier': 'N/A',
+    'document_name': 'N/A',
+    'country_issuing_id': 'N/A',
+    'refresh_status': 'N/A',
+    'material_changename': 'N/A',
+    'KycRefresh_created_date': 'N/A',
+    'KycRefresh_updated_date': 'N/A',
+}
+
+MISSING_ONBOARDING_DATA = {
+    'entity_legal_name': 'N/A',
+    'client_identifier': 'N/A',
+    'member_type': 'N/A',
+    'country_issuing_id': 'N/A',
+    'document_name': 'N/A',
+}
+
+
+def load_agent_data(conn, client_identifier):
+    """Jobs, total time, steps taken and average score per agent, from the client rollup and AgentStepLog."""
+    agent_data = {}
+    for agent, total_jobs, total_time, score_sum, score_count in conn.execute(
+        """
+        SELECT agent, jobs, total_time, score_sum, score_count
+        FROM AgentRollupClient
+        WHERE client_identifier = ?
+        ORDER BY agent
+        """,
+        (client_identifier,),
+    ):
+        agent_data[agent] = {
+            'total_jobs': total_jobs,
+            'total_time': round(total_time, 2),
+            'tool_called': 'N/A',
+            'accuracy': round(score_sum / score_count, 2) if score_count else 'N/A',
+        }
+    # Steps taken per agent, in order of first appearance
+    tools_called = {}
+    for agent, step in conn.execute(
+        """
+        SELECT agent, step
+        FROM AgentStepLog
+        WHERE client_identifier = ? AND agent IS NOT NULL
+        GROUP BY agent, step
+        ORDER BY MIN(id)
+        """,
+        (client_identifier,),
+    ):
+        tools_called.setdefault(agent, []).append(step)
+    for agent, steps in tools_called.items():
+        if agent in agent_data:
+            agent_data[agent]['tool_called'] = ', '.join(steps)
+    return agent_data
+
+
+def load_criminal_scan_result(conn, client_identifier):
+    """The 'result' of the first 'Scan Profiles (Screening Agent)' step of the client, or 'N/A'."""
+    row = conn.execute(
+        "SELECT result FROM AgentStepLog WHERE client_identifier = ? AND step = ? AND agent = ? ORDER BY id LIMIT 1",
+        (client_identifier, *SCAN_PROFILES_STEP),
+    ).fetchone()
+    return row[0] if row and row[0] is not None else "N/A"
+
+
+class ClientDetail:
+    """Everything the client detail page displays for one KycRefreshData row."""
+
+    def __init__(self, refresh_data, onboarding_data, screening_agent_status, agent_data, criminal_scan_result):
+        self.refresh_data = refresh_data
+        self.onboarding_data = onboarding_data
+        self.client_identifier = refresh_data.get('client_identifier', 'N/A')
+        self.screening_agent_status = screening_agent_status
+        self.agent_data = agent_data
+        self.criminal_scan_result = criminal_scan_result
+
+
+def load_client_detail(conn, refresh_id):
+    """Read the refresh row, its onboarding row, latest screening status and agent step aggregates."""
+    refresh_df = pd.read_sql_query(
+        """
+        SELECT r.*,
+            (SELECT screening_agent_status FROM KycRefreshData
+             WHERE client_identifier = r.client_identifier
+             ORDER BY id DESC LIMIT 1) AS latest_screening_agent_status
+        FROM KycRefreshData r
+        WHERE r.id = ?
+        """,
+        conn,
+        params=(refresh_id,),
+    )
+    if refresh_df.empty:
+        return ClientDetail(dict(MISSING_REFRESH_DATA), dict(MISSING_ONBOARDING_DATA), '0', {}, "N/A")
+
+    refresh_data = refresh_df.iloc[0].to_dict()
+    screening_agent_status = refresh_data.pop('latest_screening_agent_status')
+    client_identifier = refresh_data.get('client_identifier')
+
+    onboarding_df = pd.read_sql_query(
+        "SELECT * FROM OnboardingData WHERE client_identifier = ? LIMIT 1", conn, params=(client_identifier,)
+    )
+    onboarding_data = onboarding_df.iloc[0].to_dict() if not onboarding_df.empty else dict(MISSING_ONBOARDING_DATA)
+
+    return ClientDetail(
+        refresh_data,
+        onboarding_data,
+        screening_agent_status,
+        load_agent_data(conn, client_identifier),
+        load_criminal_scan_result(conn, client_identifier),
+    )
+
+
+class ClientDetailCache:
+    """ClientDetail per KycRefreshData id, invalidated by client_identifier from the change log."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.details = {}
+        self.last_seq = 0
+        self.lock = threading.Lock()
+
+    def get_sync(self, refresh_id):
+        """Blocking version of get(); runs on a database worker thread."""
+        conn = async_db.connection(self.db_path)
+        with self.lock:
+            keys, self.last_seq = read_changes(conn, self.last_seq)
+            if keys is None:
+                self.details.clear()
+            elif keys:
+                changed = set(keys)
+                self.details = {
+                    key: detail for key, detail in self.details.items() if detail.client_identifier not in changed
+                }
+            detail = self.details.get(refresh_id)
+            seen_seq = self.last_seq
+        if detail is None:
+            detail = load_client_detail(conn, refresh_id)
+            with self.lock:
+                # Skip caching if changes arrived while loading, or the row does not exist (yet)
+                if self.last_seq == seen_seq and detail.client_identifier != 'N/A':
+                    self.details[refresh_id] = detail
+                    while len(self.details) > CLIENT_DETAIL_CACHE_MAX_ENTRIES:
+                        del self.details[next(iter(self.details))]
+        return detail
+
+    async def get(self, refresh_id):
+        """ClientDetail of a KycRefreshData row, loaded on the database thread pool when not cached."""
+        return await async_db.run(self.get_sync, refresh_id)
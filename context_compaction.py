@@ -0,0 +1,74 @@
+"""Token-budgeted compaction of the conversation passed between KYC processing steps."""
+
+import json
+
+# Rough conversion used to estimate prompt size without calling a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Token budget for the history sent with each step's prompt
+DEFAULT_TOKEN_BUDGET = 4000
+STEP_TOKEN_BUDGETS = {
+    "extract_new_data": 4000,
+    "check_eligibility": 3000,
+    "update_profile": 3000,
+    "scan_criminal_records": 2000,
+    "scan_profiles": 2000,
+    "adverse_media": 2000,
+    "generate_final_report": 3000,
+}
+
+# Longest text kept for a single step summary
+SUMMARY_MAX_CHARS = 2000
+
+
+def estimate_tokens(items):
+    """Estimate the number of tokens in a list of input items."""
+    return sum(len(json.dumps(item, default=str)) for item in items) // CHARS_PER_TOKEN
+
+
+def record_step_summary(result, previous, name, summary):
+    """Attach the summaries of all steps so far, plus this one, to `result`."""
+    summaries = dict(getattr(previous, "step_summaries", None) or {})
+    if isinstance(summary, str) and len(summary) > SUMMARY_MAX_CHARS:
+        summary = summary[:SUMMARY_MAX_CHARS] + " ...[truncated]"
+    summaries[name] = summary
+    result.step_summaries = summaries
+    return result
+
+
+def summary_message(summaries):
+    """Build the user message that stands in for the compacted turns."""
+    return {
+        "content": "Summary of the earlier KYC review steps:\n" + json.dumps(summaries, indent=2, default=str),
+        "role": "user",
+    }
+
+
+def last_turn_start(items):
+    """Index of the last user message, where the latest step's turn starts; len(items) if there is none.
+
+    Tool calls and their outputs are not user messages, so the turn keeps them paired.
+    """
+    for index in range(len(items) - 1, -1, -1):
+        if isinstance(items[index], dict) and items[index].get("role") == "user":
+            return index
+    return len(items)
+
+
+def compact_input_list(result, step):
+    """Return the history of `result` to send with the next step, within the step's token budget.
+
+    Under budget the full history is returned. Over budget, earlier turns are replaced by the
+    structured step summaries, keeping the latest turn verbatim if that still fits.
+    """
+    items = result.to_input_list()
+    budget = STEP_TOKEN_BUDGETS.get(step, DEFAULT_TOKEN_BUDGET)
+    summaries = getattr(result, "step_summaries", None)
+    if not summaries or estimate_tokens(items) <= budget:
+        return items
+
+    # Keeping the latest turn whole keeps its tool calls paired
+    compacted = [summary_message(summaries)] + items[last_turn_start(items):]
+    if estimate_tokens(compacted) <= budget:
+        return compacted
+    return [summary_message(summaries)]
@@ -0,0 +1,115 @@
+"""In-process cache of the formatted dashboard rows, shared by every connected client.
+
+Triggers on KycRefreshData append the client_identifier of each changed row to
+DashboardChangeLog (see schema_migrations). Before serving a page the cache reads the
+newest log sequence number and reloads only the clients that changed since it last looked.
+"""
+
+import sqlite3
+import threading
+
+import pandas as pd
+
+CHANGE_LOG_TABLE = "DashboardChangeLog"
+# Old change log entries are pruned once the log grows past this many rows
+CHANGE_LOG_MAX_ROWS = 10000
+# Number of client_identifiers per IN (...) query when reloading changed clients
+RELOAD_CHUNK_SIZE = 500
+
+
+def search_key(values):
+    """Normalize text for prefix search: case and accents folded, words separated by single spaces."""
+    return ' ' + (
+        values.fillna('').astype(str).str.casefold()
+        .str.normalize('NFKD')
+        .str.replace(r'[\u0300-\u036f]', '', regex=True)
+        .str.replace(r'[^\w]+', ' ', regex=True)
+        .str.strip()
+    )
+
+
+def read_changes(conn, since_seq):
+    """Return (client_identifiers changed after `since_seq`, newest seq).
+
+    The list is None when entries after `since_seq` were already pruned, in which case callers
+    must reload everything. Prunes the log once it grows past CHANGE_LOG_MAX_ROWS.
+    """
+    first_seq, last_seq = conn.execute(f"SELECT MIN(seq), MAX(seq) FROM {CHANGE_LOG_TABLE}").fetchone()
+    last_seq = last_seq or 0
+    if first_seq is not None and first_seq > since_seq + 1:
+        keys = None
+    else:
+        keys = [row[0] for row in conn.execute(
+            f"SELECT DISTINCT client_identifier FROM {CHANGE_LOG_TABLE} WHERE seq > ?", (since_seq,)
+        )]
+    if first_seq is not None and last_seq - first_seq > CHANGE_LOG_MAX_ROWS:
+        conn.execute(f"DELETE FROM {CHANGE_LOG_TABLE} WHERE seq <= ?", (last_seq - CHANGE_LOG_MAX_ROWS,))
+        conn.commit()
+    return keys, last_seq
+
+
+class DashboardCache:
+    """Formatted rows of a DashboardQuery kept in memory; filtering and paging never touch SQLite."""
+
+    def __init__(self, query, format_rows, db_path, key_column='client_identifier'):
+        self.query = query
+        self.format_rows = format_rows
+        self.db_path = db_path
+        self.key_column = key_column
+        self.frame = None
+        self.last_seq = 0
+        self.lock = threading.Lock()
+
+    def load_rows(self, conn, keys=None):
+        """Load and format all rows, or only the rows of the given client_identifiers."""
+        if keys is None:
+            frames = [pd.read_sql_query(f"SELECT * FROM ({self.query.base_sql})", conn)]
+        else:
+            frames = []
+            for start in range(0, len(keys), RELOAD_CHUNK_SIZE):
+                chunk = keys[start:start + RELOAD_CHUNK_SIZE]
+                frames.append(pd.read_sql_query(
+                    f"SELECT * FROM ({self.query.base_sql}) WHERE {self.key_column} IN ({', '.join('?' * len(chunk))})",
+                    conn,
+                    params=chunk,
+                ))
+        rows = self.format_rows(pd.concat(frames, ignore_index=True))
+        for name, columns in self.query.search_columns.items():
+            rows[f'_search_{name}'] = search_key(rows[columns].fillna('').astype(str).agg(' '.join, axis=1))
+        return rows
+
+    def refresh(self):
+        """Bring the cached rows up to date with the change log and return them."""
+        with self.lock, sqlite3.connect(self.db_path) as conn:
+            keys, last_seq = read_changes(conn, self.last_seq)
+            if self.frame is None or keys is None:
+                self.frame = self.load_rows(conn)
+            elif keys:
+                changed = self.load_rows(conn, keys)
+                kept = self.frame[~self.frame[self.key_column].isin(keys)]
+                self.frame = pd.concat([kept, changed], ignore_index=True).sort_values(self.query.order_by)
+            self.last_seq = last_seq
+            return self.frame
+
+    def filter(self, frame, filters):
+        """Apply the dashboard filters in memory, with the same semantics as the SQL query."""
+        mask = pd.Series(True, index=frame.index)
+        for name, column in self.query.filter_columns.items():
+            value = (filters.get(name) or '').strip()
+            if not value:
+                continue
+            if name in self.query.search_columns:
+                keys = frame[f'_search_{name}']
+                for token in search_key(pd.Series([value])).iloc[0].split():
+                    mask &= keys.str.contains(' ' + token, regex=False)
+            else:
+                mask &= frame[column].astype(str).str.contains(value, case=False, regex=False, na=False)
+        return frame[mask]
+
+    def fetch_page(self, filters, page, page_size, sort_by=None, descending=False):
+        """Return (rows of the page as a DataFrame, total rows, page) with the page clamped to range."""
+        filtered = self.filter(self.refresh(), filters)
+        if sort_by in self.query.sort_columns and sort_by in filtered.columns:
+            filtered = filtered.sort_values(sort_by, ascending=not descending, kind='stable', na_position='last')
+        page = max(1, min(page, (len(filtered) + page_size - 1) // page_size))
+        return filtered.iloc[(page - 1) * page_size:page * page_size], len(filtered), page
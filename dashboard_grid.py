@@ -0,0 +1,58 @@
+"""Server-side paged overview grid shared by the dashboards.
+
+The grid is a single Quasar table: the browser only ever holds the rows of the visible page, and
+paging or sorting emits one `request` event that the server answers with the next page.
+"""
+
+from nicegui import ui
+
+ROWS_PER_PAGE_OPTIONS = [25, 50, 100]
+
+# Client name links to the client detail page
+NAME_CELL_SLOT = r'''
+<q-td :props="props">
+    <a :href="'/client/' + props.row.id" class="text-blue-600 font-medium underline">{{ props.value }}</a>
+</q-td>
+'''
+
+# Refresh status as a colored button opening the client detail page
+STATUS_CELL_SLOT = r'''
+<q-td :props="props">
+    <q-btn dense no-caps unelevated :color="props.row.status_color" :label="props.value" :href="'/client/' + props.row.id" />
+</q-td>
+'''
+
+
+def grid_pagination(state, total_rows):
+    """QTable pagination object for the state of one dashboard page instance."""
+    return {
+        'page': state['page'],
+        'rowsPerPage': state['rows_per_page'],
+        'sortBy': state['sort_by'],
+        'descending': state['descending'],
+        'rowsNumber': total_rows,
+    }
+
+
+def data_grid(columns, state, on_change):
+    """Create the overview grid; paging and sorting requests update `state` and await `on_change()`."""
+    options = sorted(set(ROWS_PER_PAGE_OPTIONS) | {state['rows_per_page']})
+    table = ui.table(columns=columns, rows=[], row_key='id', pagination=grid_pagination(state, 0))
+    table.props(f'flat bordered virtual-scroll :rows-per-page-options="{options}"').classes('w-full')
+
+    async def handle_request(e):
+        pagination = e.args['pagination']
+        state['page'] = pagination.get('page') or 1
+        state['rows_per_page'] = pagination.get('rowsPerPage') or state['rows_per_page']
+        state['sort_by'] = pagination.get('sortBy')
+        state['descending'] = bool(pagination.get('descending'))
+        await on_change()
+
+    table.on('request', handle_request, ['pagination'])
+    return table
+
+
+def show_page(table, state, rows, total_rows):
+    """Send one page of rows to the grid together with its pagination."""
+    table.rows = rows
+    table.pagination = grid_pagination(state, total_rows)
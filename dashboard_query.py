@@ -0,0 +1,90 @@
+"""SQL query builder for the dashboard tables: filtering, counting and paging run inside SQLite."""
+
+import re
+
+import pandas as pd
+
+
+def like_pattern(value):
+    """Turn a filter value into a LIKE pattern matching it anywhere, with wildcards escaped."""
+    escaped = str(value).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def match_expression(columns, value):
+    """Build an FTS5 MATCH term requiring every word of `value` as a token prefix in any of `columns`."""
+    tokens = re.findall(r'\w+', str(value))
+    if not tokens:
+        return None
+    phrases = ' '.join(f'"{token}"*' for token in tokens)
+    return f"{{{' '.join(columns)}}} : ({phrases})"
+
+
+class DashboardQuery:
+    """Filtered, paginated view over a dashboard SELECT.
+
+    `filter_columns` maps dashboard filter names (name, material, status, case_id, data_source)
+    to result columns; each non-empty filter becomes a case-insensitive substring match.
+
+    Filters listed in `search_columns` are answered from the FTS5 table `search_table` instead,
+    whose rowid is the `id` of the dashboard rows: every word must match a token prefix, and
+    matching rows are ordered by relevance unless the caller asks for one of `sort_columns`.
+    """
+
+    def __init__(self, base_sql, filter_columns, order_by='id', search_table=None, search_columns=None, sort_columns=()):
+        self.base_sql = base_sql
+        self.filter_columns = filter_columns
+        self.order_by = order_by
+        self.search_table = search_table
+        self.search_columns = search_columns or {}
+        self.sort_columns = set(sort_columns) | set(filter_columns.values()) | {order_by}
+
+    def where(self, filters):
+        """Return the FROM ... WHERE part of the query, its parameters and whether it uses full-text search."""
+        clauses, params, terms = [], [], []
+        for name, column in self.filter_columns.items():
+            value = (filters.get(name) or '').strip()
+            if not value:
+                continue
+            if self.search_table and name in self.search_columns:
+                term = match_expression(self.search_columns[name], value)
+                if term:
+                    terms.append(term)
+                continue
+            clauses.append(f"b.{column} LIKE ? ESCAPE '\\'")
+            params.append(like_pattern(value))
+
+        source = f"FROM ({self.base_sql}) b"
+        if terms:
+            source += (
+                f" JOIN (SELECT rowid, rank FROM {self.search_table} WHERE {self.search_table} MATCH ?) s"
+                " ON s.rowid = b.id"
+            )
+            params.insert(0, ' AND '.join(terms))
+        return source + (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params, bool(terms)
+
+    def count(self, conn, filters):
+        """Number of rows matching the filters."""
+        source, params, _ = self.where(filters)
+        return conn.execute(f"SELECT COUNT(*) {source}", params).fetchone()[0]
+
+    def fetch_page(self, conn, filters, page, page_size, sort_by=None, descending=False):
+        """Return (rows of the page as a DataFrame, total rows, page) with the page clamped to range.
+
+        `sort_by` is ignored unless it is one of the sortable columns, since it is interpolated into the SQL.
+        """
+        total_rows = self.count(conn, filters)
+        page = max(1, min(page, (total_rows + page_size - 1) // page_size))
+        source, params, ranked = self.where(filters)
+        if sort_by in self.sort_columns:
+            order_by = f"b.{sort_by} {'DESC' if descending else 'ASC'}, b.{self.order_by}"
+        elif ranked:
+            order_by = f"s.rank, b.{self.order_by}"
+        else:
+            order_by = f"b.{self.order_by}"
+        df = pd.read_sql_query(
+            f"SELECT b.* {source} ORDER BY {order_by} LIMIT ? OFFSET ?",
+            conn,
+            params=params + [page_size, (page - 1) * page_size],
+        )
+        return df, total_rows, page
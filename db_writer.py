@@ -0,0 +1,186 @@
+"""Serialized, non-blocking writes to the KYC database from the async workflow.
+
+Every write of the workflows running in a process goes through one writer thread per database,
+so no write blocks the event loop and concurrent workflows never contend with each other for
+SQLite's write lock. Jobs run in the order they were queued; consecutive `write()` jobs are
+committed in one transaction, each in its own savepoint so a failing write does not undo the
+others. The database runs in WAL mode, so the GUIs keep reading while the writer commits; a busy
+timeout and asyncio backoff absorb locks held by other processes.
+"""
+
+import asyncio
+import itertools
+import queue
+import sqlite3
+import threading
+import time
+
+# Most queued writes committed in one transaction
+WRITE_BATCH_SIZE = 50
+BUSY_TIMEOUT_MS = 5000
+# Attempts of a write that keeps finding the database locked; the delay doubles between them
+WRITE_ATTEMPTS = 5
+RETRY_BASE_DELAY_SEC = 0.5
+RETRY_MAX_DELAY_SEC = 8
+# Pause before the writer reconnects after its connection or loop failed
+RESTART_DELAY_SEC = 1
+
+
+def configure(conn):
+    """Put the database in WAL mode and wait up to BUSY_TIMEOUT_MS for locks instead of failing."""
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+
+
+def is_locked(error):
+    return isinstance(error, sqlite3.OperationalError) and (
+        "locked" in str(error) or "busy" in str(error)
+    )
+
+
+class WriteJob:
+    """A queued write and the future of the event loop that awaits it."""
+
+    def __init__(self, func, args, in_transaction):
+        self.func = func
+        self.args = args
+        self.in_transaction = in_transaction
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+
+    def settle(self, result=None, error=None):
+        """Resolve the future from the writer thread."""
+        def set_outcome():
+            if self.future.done():
+                return
+            if error is not None:
+                self.future.set_exception(error)
+            else:
+                self.future.set_result(result)
+
+        try:
+            self.loop.call_soon_threadsafe(set_outcome)
+        except RuntimeError:
+            # The awaiting loop has closed; nobody is waiting for the outcome
+            pass
+
+
+class DatabaseWriter:
+    """Thread owning the write connection to one database."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.jobs = queue.Queue()
+        # Jobs taken from the queue and not yet settled
+        self.batch = []
+        self.thread = threading.Thread(target=self.work, name='kyc-db-writer', daemon=True)
+        self.thread.start()
+
+    def work(self):
+        """Run queued jobs forever; a failure fails the pending jobs and reopens the connection."""
+        while True:
+            conn = None
+            try:
+                conn = sqlite3.connect(self.db_path, isolation_level=None)
+                configure(conn)
+                while True:
+                    self.run_batch(conn)
+            except Exception as e:
+                print(f"Warning: Database writer for {self.db_path} failed, restarting: {e}")
+                self.fail_pending(e)
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except sqlite3.Error:
+                        pass
+                time.sleep(RESTART_DELAY_SEC)
+
+    def run_batch(self, conn):
+        """Run the next queued jobs in order, committing each run of consecutive writes together."""
+        self.batch = [self.jobs.get()]
+        while len(self.batch) < WRITE_BATCH_SIZE:
+            try:
+                self.batch.append(self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        for in_transaction, jobs in itertools.groupby(self.batch, key=lambda job: job.in_transaction):
+            if in_transaction:
+                self.commit(conn, list(jobs))
+                continue
+            # Calls open their own connection, so they run outside the writer's transaction
+            for job in jobs:
+                try:
+                    job.settle(job.func(*job.args))
+                except Exception as e:
+                    job.settle(error=e)
+        self.batch = []
+
+    def fail_pending(self, error):
+        """Fail the jobs of the interrupted batch and every queued job, so no caller waits forever."""
+        pending, self.batch = self.batch, []
+        while True:
+            try:
+                pending.append(self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        for job in pending:
+            job.settle(error=error)
+
+    def commit(self, conn, jobs):
+        """Run the jobs in one transaction; outcomes are only reported once it has committed."""
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for job in jobs:
+                conn.execute("SAVEPOINT write_job")
+                try:
+                    outcomes.append((job, job.func(conn, *job.args), None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_job")
+                    outcomes.append((job, None, e))
+                conn.execute("RELEASE write_job")
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for job in jobs:
+                job.settle(error=e)
+            return
+        for job, result, error in outcomes:
+            job.settle(result, error)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def writer(db_path):
+    """The DatabaseWriter of `db_path`, started on first use."""
+    with _writers_lock:
+        if db_path not in _writers or not _writers[db_path].thread.is_alive():
+            _writers[db_path] = DatabaseWriter(db_path)
+        return _writers[db_path]
+
+
+async def _submit(db_path, func, args, in_transaction):
+    for attempt in range(WRITE_ATTEMPTS):
+        job = WriteJob(func, args, in_transaction)
+        writer(db_path).jobs.put(job)
+        try:
+            return await job.future
+        except sqlite3.OperationalError as e:
+            if not is_locked(e) or attempt == WRITE_ATTEMPTS - 1:
+                raise
+            delay = min(RETRY_BASE_DELAY_SEC * 2 ** attempt, RETRY_MAX_DELAY_SEC)
+            print(f"Database is locked. Retrying in {delay} sec... (Attempt {attempt + 1}/{WRITE_ATTEMPTS})")
+            await asyncio.sleep(delay)
+
+
+async def write(db_path, func, *args):
+    """Run `func(conn, *args)` in the writer's next transaction and return its result once committed."""
+    return await _submit(db_path, func, args, True)
+
+
+async def call(db_path, func, *args):
+    """Run a blocking `func(*args)` that writes through its own connection on the writer thread."""
+    return await _submit(db_path, func, args, False)
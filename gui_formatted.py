@@ -1,54 +1,76 @@
 # -------------------------------------------
 # Imports and Constants
 # -------------------------------------------
-from nicegui import ui
-import sqlite3
-import json
+from nicegui import app, ui
 import pandas as pd
+import async_db
+import progress_bus
+from schema_migrations import migrate, LATENCY_BUCKET_BOUNDS
+from dashboard_query import DashboardQuery
+from dashboard_cache import DashboardCache
+from client_detail import ClientDetailCache
+from job_queue import JobWorkerPool
+from agent_performance import load_fleet_performance, load_score_distribution
+from dashboard_grid import data_grid, show_page, NAME_CELL_SLOT, STATUS_CELL_SLOT
 
 # Database and table configuration
 DB_PATH = 'data/KYC_DataBase.db'
 TABLE_NAME_1 = 'OnboardingData'
 TABLE_NAME_2 = 'KycRefreshData'
 TABLE_NAME_3 = 'log' 
-ITEMS_PER_PAGE = 5
+ITEMS_PER_PAGE = 25
 
 # -------------------------------------------
 # Dashboard State and Filter Inputs
 # -------------------------------------------
-# Store dashboard state for pagination and filters
-dashboard_state = {
-    'page': 1,
-    'name': '',
-    'material': '',
-    'status': '',
-    'case_id': '',
-    'data_source': '',
-}
-
-# Global dictionary to store input fields for filters
-filter_inputs = {}
+# Every dashboard page instance (one per browser tab) gets its own state and widgets,
+# so analysts page and filter independently on top of the shared DASHBOARD_CACHE
+def new_dashboard_state():
+    """Fresh pagination and filter state for one dashboard page instance."""
+    return {
+        'page': 1,
+        'name': '',
+        'material': '',
+        'status': '',
+        'case_id': '',
+        'data_source': '',
+        'rows_per_page': ITEMS_PER_PAGE,
+        'sort_by': None,
+        'descending': False,
+    }
 
 # -------------------------------------------
 # Data Fetching and Processing Functions
 # -------------------------------------------
-def get_data():
-    """Fetch and merge onboarding and refresh data from the database, format dates, and ensure string types."""
-    with sqlite3.connect(DB_PATH) as conn:
-        df = pd.read_sql_query(
-            f"""
-            SELECT
-                id,
-                entity_legal_name,
-                client_identifier,
-                document_name,  
-                material_changename,
-                refresh_status,
-                KycRefresh_created_date,
-                KycRefresh_created_date AS sla_start_date,
-                KycRefresh_updated_date
-            FROM {TABLE_NAME_2}
-            """, conn)
+DASHBOARD_QUERY = DashboardQuery(
+    f"""
+    SELECT
+        r.id,
+        r.entity_legal_name,
+        r.dba_name,
+        r.member_legal_name,
+        r.client_identifier,
+        r.document_name,
+        r.material_changename,
+        latest.refresh_status,
+        r.KycRefresh_created_date,
+        r.KycRefresh_created_date AS sla_start_date,
+        r.KycRefresh_updated_date
+    FROM {TABLE_NAME_2} r
+    LEFT JOIN {TABLE_NAME_2} latest ON latest.id = (
+        SELECT id FROM {TABLE_NAME_2}
+        WHERE client_identifier = r.client_identifier
+        ORDER BY id DESC LIMIT 1
+    )
+    """,
+    {'name': 'entity_legal_name', 'material': 'material_changename', 'status': 'refresh_status', 'case_id': 'client_identifier', 'data_source': 'document_name'},
+    search_table='KycRefreshSearch',
+    search_columns={'name': ['entity_legal_name', 'dba_name', 'member_legal_name'], 'data_source': ['document_name']},
+    sort_columns=['KycRefresh_created_date', 'sla_start_date', 'KycRefresh_updated_date'],
+)
+
+def format_data(df):
+    """Format dates, compute the case SLA date and ensure string types for the rows of a page."""
     # Ensure string types for relevant columns
     for col in ['entity_legal_name', 'material_changename', 'refresh_status','document_name']:
         if col in df.columns:
@@ -63,377 +85,217 @@ def get_data():
         df[col] = df[col].dt.strftime('%Y-%m-%d').fillna('N/A')
     return df
 
-def filter_df(df, name, material, status, case_id, data_source):
-    """Apply filters to the dataframe based on user input."""
-    if name:
-        df = df[df['entity_legal_name'].str.contains(name, case=False, na=False)]
-    if material:
-        df = df[df['material_changename'].str.contains(material, case=False, na=False)]
-    if status:
-        df = df[df['refresh_status'].str.contains(status, case=False, na=False)]
-    if case_id:
-        df = df[df['client_identifier'].str.contains(case_id, case=False, na=False)]
-    if data_source:
-        df = df[df['document_name'].str.contains(data_source, case=False, na=False)]
-    return df
+# Formatted dashboard rows shared by all clients, refreshed only for clients whose refresh data changed
+DASHBOARD_CACHE = DashboardCache(DASHBOARD_QUERY, format_data, DB_PATH)
 
-def update_data_table():
-    """Update the data table dynamically based on the current filters and pagination state."""
-    df = get_data()
-    filtered = filter_df(
-        df,
-        dashboard_state['name'],
-        dashboard_state['material'],
-        dashboard_state['status'],
-        dashboard_state['case_id'],
-        dashboard_state['data_source'],
+async def get_page_data(state):
+    """Fetch the current page of the dashboard from the shared in-memory cache."""
+    df, total_rows, state['page'] = await async_db.run(
+        DASHBOARD_CACHE.fetch_page, dict(state), state['page'], state['rows_per_page'], state['sort_by'], state['descending']
     )
-    total_pages = max(1, (len(filtered) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE)
-    dashboard_state['page'] = max(1, min(dashboard_state['page'], total_pages))
-    paginated = filtered.iloc[(dashboard_state['page']-1)*ITEMS_PER_PAGE:dashboard_state['page']*ITEMS_PER_PAGE]
-
-    # Clear and update the data table UI
-    data_table.clear()
-    for _, row in paginated.iterrows():
-        with data_table:
-            with ui.row().classes('border-b p-3 items-center hover:bg-gray-50 transition-all rounded-lg'):
-                ui.link(row['entity_legal_name'], f'/client/{row["id"]}').classes('text-blue-600 font-medium underline w-40 text-center')
-                
-                # Display material change as Yes/No
-                material_change_value = row.get('material_changename', None)
-                val = str(material_change_value).strip().lower()
-                if not val or val in ('none', 'nan', 'null', '0'):
-                    material_change_display = "No"
-                else:
-                    material_change_display = "Yes"
-                ui.label(material_change_display).classes('w-40 text-center text-gray-700')
-                
-                # Display refresh status as a button with color coding
-                refresh_status_value = get_refresh_status(row['client_identifier'])
-                if refresh_status_value == '1':
-                    refresh_status_display = "KYC Refresh is triggered"
-                    button_classes = 'w-40 text-center bg-blue-500 text-white hover:bg-blue-600'
-                elif refresh_status_value == '0':
-                    refresh_status_display = "Profile Updates Absorbed"
-                    button_classes = 'w-40 text-center bg-green-500 text-white hover:bg-green-600'
-                else:
-                    refresh_status_display = "KYC Refresh Not Triggered"
-                    button_classes = 'w-40 text-center bg-gray-400 text-white hover:bg-gray-500'
-
-                ui.button(
-                    refresh_status_display,
-                    on_click=lambda client_id=row['id']: ui.navigate.to(f'/client/{client_id}')
-                ).classes(button_classes)
-
-                ui.label(row.get('client_identifier', '')).classes('w-40 text-center text-gray-700')
-                
-                doc_val = row.get('document_name', '')
-                ui.label(doc_val if doc_val and str(doc_val).strip() else 'N/A').classes('w-40 text-center text-gray-700')
-                
-                ui.label(str(row.get('KycRefresh_created_date', ''))[:10]).classes('w-40 text-center text-gray-700')
-                ui.label(str(row.get('case_sla_date', ''))[:10]).classes('w-40 text-center text-gray-700')
-                ui.label(str(row.get('KycRefresh_updated_date', ''))[:10]).classes('w-40 text-center text-gray-700')
-
-    # Update pagination controls
-    pagination_label.set_text(f"Page {dashboard_state['page']} of {total_pages}")
-    if dashboard_state['page'] == 1:
-        prev_button.disable()
-    else:
-        prev_button.enable()
-
-    if dashboard_state['page'] == total_pages:
-        next_button.disable()
-    else:
-        next_button.enable()
+    return df, total_rows
+
+# Refresh status code of the client's latest refresh -> (label, Quasar button color) shown in the grid
+REFRESH_STATUS_DISPLAY = {
+    '1': ("KYC Refresh is triggered", 'blue-6'),
+    '0': ("Profile Updates Absorbed", 'green-6'),
+}
+
+def grid_rows(df):
+    """Turn a page of formatted rows into the row dicts displayed by the overview grid."""
+    rows = []
+    for _, row in df.iterrows():
+        # Display material change as Yes/No
+        val = str(row.get('material_changename', None)).strip().lower()
+        material_change_display = "No" if not val or val in ('none', 'nan', 'null', '0') else "Yes"
+        refresh_status_display, status_color = REFRESH_STATUS_DISPLAY.get(
+            row.get('refresh_status', ''), ("KYC Refresh Not Triggered", 'grey-6')
+        )
+        doc_val = row.get('document_name', '')
+        rows.append({
+            'id': int(row['id']),
+            'entity_legal_name': row['entity_legal_name'],
+            'material_changename': material_change_display,
+            'refresh_status': refresh_status_display,
+            'status_color': status_color,
+            'client_identifier': str(row.get('client_identifier', '')),
+            'document_name': doc_val if doc_val and str(doc_val).strip() else 'N/A',
+            'KycRefresh_created_date': str(row.get('KycRefresh_created_date', ''))[:10],
+            'case_sla_date': str(row.get('case_sla_date', ''))[:10],
+            'KycRefresh_updated_date': str(row.get('KycRefresh_updated_date', ''))[:10],
+        })
+    return rows
+
+# Grid columns; `name` is the column the server sorts on
+GRID_COLUMNS = [
+    {'name': 'entity_legal_name', 'label': 'Client Name', 'field': 'entity_legal_name', 'sortable': True, 'align': 'left'},
+    {'name': 'material_changename', 'label': 'Material Change', 'field': 'material_changename', 'sortable': True, 'align': 'center'},
+    {'name': 'refresh_status', 'label': 'Refresh Status', 'field': 'refresh_status', 'sortable': True, 'align': 'center'},
+    {'name': 'client_identifier', 'label': 'Case ID', 'field': 'client_identifier', 'sortable': True, 'align': 'center'},
+    {'name': 'document_name', 'label': 'Data Source', 'field': 'document_name', 'sortable': True, 'align': 'center'},
+    {'name': 'KycRefresh_created_date', 'label': 'KYC Creation Date', 'field': 'KycRefresh_created_date', 'sortable': True, 'align': 'center'},
+    {'name': 'sla_start_date', 'label': 'Case SLA Date', 'field': 'case_sla_date', 'sortable': True, 'align': 'center'},
+    {'name': 'KycRefresh_updated_date', 'label': 'KYC Updated Date', 'field': 'KycRefresh_updated_date', 'sortable': True, 'align': 'center'},
+]
+
+async def update_data_table(view):
+    """Send the current page of one dashboard page instance to its grid."""
+    paginated, total_rows = await get_page_data(view['state'])
+    show_page(view['table'], view['state'], grid_rows(paginated), total_rows)
 
 # -------------------------------------------
-# Agent Data Extraction and Parsing Functions
+# Client Detail Data
 # -------------------------------------------
-def parse_step(step_str):
-    """Parse a step string to extract the step name and agent name."""
-    if " (" in step_str and step_str.endswith(")"):
-        step_name, agent_part = step_str.rsplit(" (", 1)
-        agent_name = agent_part[:-1]  # Remove the closing ")"
-        return step_name, agent_name
-    return step_str, None
-
-def get_agent_data(client_identifier):
-    """Fetch and aggregate agent log data for a given client_identifier."""
-    conn = sqlite3.connect(DB_PATH)
-    query = f"""
-    SELECT steps
-    FROM {TABLE_NAME_3}
-    WHERE [client_identifier] = ?
-    """
-    df = pd.read_sql_query(query, conn, params=(client_identifier,))
-    agent_data = {}
-    for idx, row in df.iterrows():
-        try:
-            steps_data = json.loads(row["steps"])
-            if isinstance(steps_data, list):
-                for step in steps_data:
-                    step_str = step.get("step", "")
-                    step_name, agent_name = parse_step(step_str)
-                    if agent_name:
-                        if agent_name not in agent_data:
-                            agent_data[agent_name] = {
-                                'total_jobs': 0,
-                                'total_time': 0,
-                                'tools_called': [],
-                                'scores': []
-                            }
-                        agent_data[agent_name]['total_jobs'] += 1
-                        agent_data[agent_name]['total_time'] += step.get('duration_sec', 0)
-                        # Maintain order and uniqueness for tools called
-                        if step_name not in agent_data[agent_name]['tools_called']:
-                            agent_data[agent_name]['tools_called'].append(step_name)
-                        score = step.get('score', None)
-                        if score is not None:
-                            agent_data[agent_name]['scores'].append(score)
-        except Exception as e:
-            ui.notify(f"Error parsing steps JSON: {e}", color='negative')
-    conn.close()
-    # Post-process agent data for display
-    for agent in agent_data:
-        agent_data[agent]['total_time'] = round(agent_data[agent]['total_time'], 2)
-        # Show all tools called as a comma-separated string
-        agent_data[agent]['tool_called'] = ', '.join(agent_data[agent]['tools_called']) if agent_data[agent]['tools_called'] else 'N/A'
-        if agent_data[agent]['scores']:
-            agent_data[agent]['accuracy'] = round(sum(agent_data[agent]['scores']) / len(agent_data[agent]['scores']), 2)
-        else:
-            agent_data[agent]['accuracy'] = 'N/A'
-        del agent_data[agent]['tools_called']
-        del agent_data[agent]['scores']
-    return agent_data
-
-def get_criminal_scan_result(client_identifier):
-    """Fetch the 'result' from the 'Scan Profiles (Screening Agent)' step for a client."""
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute(f"SELECT steps FROM {TABLE_NAME_3} WHERE client_identifier = ?", (client_identifier,))
-        rows = cur.fetchall()
-        for row in rows:
-            try:
-                steps = json.loads(row[0])
-                if isinstance(steps, list):
-                    for step in steps:
-                        if step.get("step") == "Scan Profiles (Screening Agent)":
-                            return step.get("result", "N/A")
-            except Exception:
-                continue
-    return "N/A"
+# Refresh, onboarding, screening and agent log data per client, dropped when the client's workflow completes
+CLIENT_DETAIL_CACHE = ClientDetailCache(DB_PATH)
+
+# Background workers running the refresh jobs queued from the dashboard and client pages
+REFRESH_WORKERS = JobWorkerPool(DB_PATH)
+app.on_startup(REFRESH_WORKERS.start)
+app.on_shutdown(REFRESH_WORKERS.stop)
 
 # -------------------------------------------
 # Dashboard Page UI Construction
 # -------------------------------------------
-def dashboard_page():
+async def dashboard_page():
     """Construct the main dashboard page UI, including filters, data table, and pagination."""
-    df = get_data()
-    filtered = filter_df(
-        df,
-        dashboard_state['name'],
-        dashboard_state['material'],
-        dashboard_state['status'],
-        dashboard_state['case_id'],
-        dashboard_state['data_source'],
-    )
-    total_pages = max(1, (len(filtered) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE)
-    dashboard_state['page'] = max(1, min(dashboard_state['page'], total_pages))
-    paginated = filtered.iloc[(dashboard_state['page']-1)*ITEMS_PER_PAGE:dashboard_state['page']*ITEMS_PER_PAGE]
+    state = new_dashboard_state()
+    filter_inputs = {}
+    view = {'state': state}
 
     # Dashboard Header Section
     with ui.element('div').classes('bg-gradient-to-r from-blue-600 to-blue-800 text-white p-6 rounded-lg shadow-lg mb-6 w-full'):
         ui.label('KYC Refresh Dashboard').classes('text-3xl font-semibold text-center')
         ui.label('KYC Review process: Intelligent Automation using AI agents').classes('text-lg text-center mt-2')
+        with ui.row().classes('w-full justify-center mt-2'):
+            ui.link('Agent Performance', '/agents').classes('text-white underline')
 
     # Filter Controls Section
     with ui.card().classes('mb-6 p-6 bg-white rounded-lg shadow-md border border-gray-200'):
         ui.label('Filter Controls').classes('text-xl font-semibold text-gray-800 mb-4')
         with ui.row().classes('gap-4 flex-wrap'):
-            filter_inputs['name'] = ui.input('Client Name', value=dashboard_state['name']).props('clearable outlined dense').classes('w-56 bg-gray-50')
-            filter_inputs['material'] = ui.input('Material Change', value=dashboard_state['material']).props('clearable outlined dense').classes('w-56 bg-gray-50')
+            filter_inputs['name'] = ui.input('Client Name', value=state['name']).props('clearable outlined dense').classes('w-56 bg-gray-50')
+            filter_inputs['material'] = ui.input('Material Change', value=state['material']).props('clearable outlined dense').classes('w-56 bg-gray-50')
             # Removed the Refresh Status filter input
-            # filter_inputs['status'] = ui.input('Refresh Status', value=dashboard_state['status']).props('clearable outlined dense').classes('w-56 bg-gray-50')
-            filter_inputs['case_id'] = ui.input('Case ID', value=dashboard_state['case_id']).props('clearable outlined dense').classes('w-56 bg-gray-50')
-            filter_inputs['data_source'] = ui.input('Data Source', value=dashboard_state['data_source']).props('clearable outlined dense').classes('w-56 bg-gray-50')
+            # filter_inputs['status'] = ui.input('Refresh Status', value=state['status']).props('clearable outlined dense').classes('w-56 bg-gray-50')
+            filter_inputs['case_id'] = ui.input('Case ID', value=state['case_id']).props('clearable outlined dense').classes('w-56 bg-gray-50')
+            filter_inputs['data_source'] = ui.input('Data Source', value=state['data_source']).props('clearable outlined dense').classes('w-56 bg-gray-50')
 
-            def apply_filters():
+            async def apply_filters():
                 """Apply the filters and update the data table."""
-                dashboard_state['name'] = filter_inputs['name'].value
-                dashboard_state['material'] = filter_inputs['material'].value
-                # dashboard_state['status'] = filter_inputs['status'].value  # Removed
-                dashboard_state['case_id'] = filter_inputs['case_id'].value
-                dashboard_state['data_source'] = filter_inputs['data_source'].value
-                dashboard_state['page'] = 1  # Reset to the first page
-                update_data_table()
-
-            def reset_filters():
+                state['name'] = filter_inputs['name'].value
+                state['material'] = filter_inputs['material'].value
+                # state['status'] = filter_inputs['status'].value  # Removed
+                state['case_id'] = filter_inputs['case_id'].value
+                state['data_source'] = filter_inputs['data_source'].value
+                state['page'] = 1  # Reset to the first page
+                await update_data_table(view)
+
+            async def reset_filters():
                 """Reset the filters and update the data table."""
-                dashboard_state.update({'name': '', 'material': '', 'status': '', 'case_id': '', 'data_source': '', 'page': 1})
+                state.update({'name': '', 'material': '', 'status': '', 'case_id': '', 'data_source': '', 'page': 1})
                 filter_inputs['name'].set_value('')
                 filter_inputs['material'].set_value('')
                 # filter_inputs['status'].set_value('')  # Removed
                 filter_inputs['case_id'].set_value('')
                 filter_inputs['data_source'].set_value('')
-                update_data_table()
+                await update_data_table(view)
 
             with ui.row().classes('gap-4'):
                 ui.button('Apply Filters', on_click=apply_filters).classes('bg-blue-600 text-white px-4 py-2 rounded-md hover:bg-blue-700 transition')
                 ui.button('Reset Filters', on_click=reset_filters).classes('bg-gray-600 text-white px-4 py-2 rounded-md hover:bg-gray-700 transition')
 
     # Data Table Section
-    global data_table
-    with ui.card().classes('mb-6 p-6 bg-white rounded-lg shadow-md border border-gray-200'):
+    with ui.card().classes('mb-6 p-6 bg-white rounded-lg shadow-md border border-gray-200 w-full'):
         ui.label('KYC Data Overview').classes('text-xl font-semibold text-gray-800 mb-4')
-        with ui.row().classes('bg-blue-50 font-semibold p-3 rounded-md shadow-sm text-gray-800'):
-            for col in ['Client Name', 'Material Change', 'Refresh Status', 'Case ID', 'Data Source', 'KYC Creation Date', 'Case SLA Date', 'KYC Updated Date']:
-                ui.label(col).classes('w-40 text-center')  # Ensure consistent width for all columns
-        
-        data_table = ui.column()
-
-    for _, row in paginated.iterrows():
-        with data_table:
-            with ui.row().classes('border-b p-3 items-center hover:bg-gray-50 transition-all rounded-lg'):
-                ui.link(row['entity_legal_name'], f'/client/{row["id"]}').classes('text-blue-600 font-medium underline w-40 text-center')
-                
-                # Display material change as Yes/No
-                material_change_value = row.get('material_changename', None)
-                val = str(material_change_value).strip().lower()
-                if not val or val in ('none', 'nan', 'null', '0'):
-                    material_change_display = "No"
-                else:
-                    material_change_display = "Yes"
-                ui.label(material_change_display).classes('w-40 text-center text-gray-700')
-                
-                # Display refresh status as a button with color coding
-                refresh_status_value = get_refresh_status(row['client_identifier'])
-                if refresh_status_value == '1':
-                    refresh_status_display = "KYC Refresh is triggered"
-                    button_classes = 'w-40 text-center bg-blue-500 text-white hover:bg-blue-600'
-                elif refresh_status_value == '0':
-                    refresh_status_display = "Profile Updates Absorbed"
-                    button_classes = 'w-40 text-center bg-green-500 text-white hover:bg-green-600'
-                else:
-                    refresh_status_display = "KYC Refresh Not Triggered"
-                    button_classes = 'w-40 text-center bg-gray-400 text-white hover:bg-gray-500'
-
-                ui.button(
-                    refresh_status_display,
-                    on_click=lambda client_id=row['id']: ui.navigate.to(f'/client/{client_id}')
-                ).classes(button_classes)
-
-                ui.label(row.get('client_identifier', '')).classes('w-40 text-center text-gray-700')
-                
-                doc_val = row.get('document_name', '')
-                ui.label(doc_val if doc_val and str(doc_val).strip() else 'N/A').classes('w-40 text-center text-gray-700')
-                
-                ui.label(str(row.get('KycRefresh_created_date', ''))[:10]).classes('w-40 text-center text-gray-700')
-                ui.label(str(row.get('case_sla_date', ''))[:10]).classes('w-40 text-center text-gray-700')
-                ui.label(str(row.get('KycRefresh_updated_date', ''))[:10]).classes('w-40 text-center text-gray-700')
-
-    # Pagination Controls Section
-    with ui.row().classes('mt-4 justify-center items-center'):
-        def prev_page():
-            """Navigate to the previous page and update the data table."""
-            if dashboard_state['page'] > 1:
-                dashboard_state['page'] -= 1
-                update_data_table()
-
-        def next_page():
-            """Navigate to the next page and update the data table."""
-            dashboard_state['page'] += 1
-            update_data_table()
-
-        global prev_button, next_button, pagination_label
-        prev_button = ui.button('Previous', on_click=prev_page).classes('bg-blue-600 text-white px-4 py-2 rounded-md hover:bg-blue-700 transition')
-        pagination_label = ui.label(f'Page {dashboard_state["page"]} of {total_pages}').classes('mx-4 text-lg text-gray-700')
-        next_button = ui.button('Next', on_click=next_page).classes('bg-blue-600 text-white px-4 py-2 rounded-md hover:bg-blue-700 transition')
-
-        if dashboard_state['page'] <= 1:
-            prev_button.disable()
-        if dashboard_state['page'] >= total_pages:
-            next_button.disable()
+        view['table'] = data_grid(GRID_COLUMNS, state, lambda: update_data_table(view))
+        view['table'].add_slot('body-cell-entity_legal_name', NAME_CELL_SLOT)
+        view['table'].add_slot('body-cell-refresh_status', STATUS_CELL_SLOT)
+        view['table'].set_selection('multiple')
 
-# -------------------------------------------
-# Utility Function to Fetch Refresh Status
-# -------------------------------------------
-def get_refresh_status(client_identifier):
-    """Fetch the latest refresh_status from KycRefreshData for a given client_identifier."""
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT refresh_status FROM KycRefreshData WHERE client_identifier = ?", (client_identifier,))
-        result = cur.fetchone()
-        return str(result[0]) if result else ''
+        async def run_refresh():
+            """Queue refresh runs for the selected clients."""
+            client_identifiers = {row['client_identifier'] for row in view['table'].selected}
+            if not client_identifiers:
+                ui.notify('Select the clients to refresh first', color='warning')
+                return
+            queued = await REFRESH_WORKERS.enqueue(client_identifiers)
+            ui.notify(f"Queued {queued} refresh run(s); {len(client_identifiers) - queued} already queued or running")
+            view['table'].selected = []
+
+        ui.button('Run Refresh', on_click=run_refresh).classes('bg-blue-600 text-white px-4 py-2 rounded-md hover:bg-blue-700 transition mt-4')
+
+    await update_data_table(view)
 
 # -------------------------------------------
 # Main Dashboard Page Route
 # -------------------------------------------
 @ui.page('/')
-def main_dashboard():
+async def main_dashboard():
     """Route for the main dashboard page."""
-    dashboard_page()
+    await dashboard_page()
 
 # -------------------------------------------
 # Client Detail Page Route and UI
 # -------------------------------------------
+def workflow_progress_card(client_identifier):
+    """Card showing the live progress of a workflow run for the client, pushed by the progress bus."""
+    ui.label('Workflow Progress').classes('text-2xl font-semibold text-blue-600 mb-4')
+    with ui.card().classes('p-6 bg-white rounded-xl shadow-lg border border-gray-100 w-full mb-8'):
+        with ui.row().classes('items-center gap-4'):
+            status_label = ui.label('No workflow run in progress').classes('text-lg font-semibold text-gray-600')
+
+            async def run_refresh():
+                """Queue a refresh run for this client."""
+                if await REFRESH_WORKERS.enqueue([client_identifier]):
+                    ui.notify('Refresh run queued')
+                else:
+                    ui.notify('A refresh run is already queued or running', color='warning')
+
+            ui.button('Run Refresh', on_click=run_refresh).classes('bg-blue-600 text-white px-4 py-2 rounded-md hover:bg-blue-700 transition')
+        steps_column = ui.column().classes('gap-1 w-full')
+    step_labels = {}
+
+    def show_event(event):
+        if event['type'] == 'run_start':
+            steps_column.clear()
+            step_labels.clear()
+            status_label.set_text('Workflow running')
+        elif event['type'] == 'step_start':
+            with steps_column:
+                step_labels[event['step']] = ui.label(f"• {event['step']}: running").classes('text-gray-600')
+        elif event['type'] == 'step_end':
+            label = step_labels.get(event['step'])
+            if label is None:
+                with steps_column:
+                    label = step_labels[event['step']] = ui.label().classes('text-gray-600')
+            label.set_text(f"• {event['step']}: {event['status']} in {event['duration_sec']} sec")
+            if event.get('output'):
+                with steps_column:
+                    ui.label(event['output']).classes('text-sm text-gray-500 pl-4').style('white-space: pre-line;')
+        elif event['type'] == 'run_end':
+            status_label.set_text(f"Workflow {event['status']} in {event['duration_sec']} sec")
+
+    history, unsubscribe = progress_bus.subscribe(client_identifier, show_event)
+    for event in history:
+        show_event(event)
+    ui.context.client.on_delete(unsubscribe)
+
 @ui.page('/client/{client_id}')
-def client_detail(client_id: int):
+async def client_detail(client_id: int):
     """
     Route for the client detail page.
     Displays onboarding, refresh, screening, and agent log details for a specific client.
     """
-    # Retrieve client details from the KycRefreshData table using id
-    with sqlite3.connect(DB_PATH) as conn:
-        refresh_df = pd.read_sql_query(
-            "SELECT * FROM KycRefreshData WHERE id = ?",
-            conn,
-            params=(client_id,)
-        )
+    # Refresh row, onboarding row, latest screening status and agent step aggregates, loaded in one pass
+    detail = await CLIENT_DETAIL_CACHE.get(client_id)
+    refresh_data = detail.refresh_data
+    onboarding_data = detail.onboarding_data
+    client_identifier = detail.client_identifier
 
-    if refresh_df.empty:
-        refresh_data = {
-            'entity_legal_name': 'N/A',
-            'client_identifier': 'N/A',
-            'document_name': 'N/A',
-            'country_issuing_id': 'N/A',
-            'refresh_status': 'N/A',
-            'material_changename': 'N/A',
-            'KycRefresh_created_date': 'N/A',
-            'KycRefresh_updated_date': 'N/A',
-        }
-    else:
-        refresh_data = refresh_df.iloc[0].to_dict()
-
-    # Use the correct client_identifier for agent logs and onboarding lookup
-    client_identifier = refresh_data.get('client_identifier', 'N/A')
-
-    # Fetch onboarding data from OnboardingData using client_identifier
-    with sqlite3.connect(DB_PATH) as conn:
-        onboarding_df = pd.read_sql_query(
-            "SELECT * FROM OnboardingData WHERE client_identifier = ?",
-            conn,
-            params=(client_identifier,)
-        )
-    if onboarding_df.empty:
-        onboarding_data = {
-            'entity_legal_name': 'N/A',
-            'client_identifier': 'N/A',
-            'member_type': 'N/A',
-            'country_issuing_id': 'N/A',
-            'document_name': 'N/A',
-        }
-    else:
-        onboarding_data = onboarding_df.iloc[0].to_dict()
-
-    # Dummy data for screening agent results (for demonstration)
-    with sqlite3.connect(DB_PATH) as conn:
-        screening_df = pd.read_sql_query(
-            "SELECT screening_agent_status FROM KycRefreshData WHERE client_identifier = ? ORDER BY id DESC LIMIT 1",
-            conn,
-            params=(client_identifier,)
-        )
+    # Dummy data for adverse media results (for demonstration)
     screening_data = {
-        'screening_agent_status': screening_df['screening_agent_status'] if not screening_df.empty else '0',
+        'screening_agent_status': detail.screening_agent_status if detail.screening_agent_status is not None else '0',
         'adverse_media_result': '0',
     }
 
@@ -471,7 +333,9 @@ def client_detail(client_id: int):
                             ui.label(f"Client Type: {refresh_data.get('member_type', 'N/A')}").classes('text-lg text-gray-600')
                             ui.label(f"Client Domicile Country: {refresh_data.get('country_issuing_id', 'N/A')}").classes('text-lg text-gray-600')
                             ui.label(f"Client Documents: {refresh_data.get('document_name', 'N/A')}").classes('text-lg text-gray-600')
-                                 
+
+        workflow_progress_card(client_identifier)
+
         # Second Row: Materiality, Screening, Agents Performance
         ui.label('Additional Details').classes('text-2xl font-semibold text-blue-600 mb-4')  # Title for the second row
         with ui.element('div').classes('grid grid-cols-1 lg:grid-cols-3 gap-6'):
@@ -491,14 +355,13 @@ def client_detail(client_id: int):
                     with ui.card().classes('p-6 bg-white rounded-xl shadow-lg border border-blue-500 hover:shadow-xl transition-shadow duration-300 mt-4 w-full'):
                         ui.label('Material Changes:').classes('text-lg font-semibold text-gray-600')
                         with ui.column().classes('gap-2 pl-10'):
-                            for _, row in refresh_df.iterrows():
-                                mat_val = row.get('material_changename', '')
-                                # Show string if present and not '0', else show N/A
-                                if mat_val and str(mat_val).strip() != '' and str(mat_val).strip() != '0':
-                                    mat_val_display = str(mat_val)
-                                else:
-                                    mat_val_display = 'N/A'
-                                ui.label(f"Material Change: {mat_val_display}").classes('text-sm text-gray-500')
+                            mat_val = refresh_data.get('material_changename', '')
+                            # Show string if present and not '0', else show N/A
+                            if mat_val and str(mat_val).strip() != '' and str(mat_val).strip() != '0':
+                                mat_val_display = str(mat_val)
+                            else:
+                                mat_val_display = 'N/A'
+                            ui.label(f"Material Change: {mat_val_display}").classes('text-sm text-gray-500')
 
                     # Conditional UI card based on Materiality Hit
                     if refresh_data.get('material_changename', 'NO') == 'YES':
@@ -523,8 +386,8 @@ def client_detail(client_id: int):
                     screening_status = str(opac_status_raw).strip() if opac_status_raw is not None else ''
                     adverse_search_status = str(search_status_raw).strip() if search_status_raw is not None else ''
                     
-                    # Get hit_details from TABLE_NAME_3
-                    hit_details = get_criminal_scan_result(client_identifier)
+                    # Result of the profile scan step in the agent log
+                    hit_details = detail.criminal_scan_result
                     search_details = adverse_search_status if adverse_search_status and adverse_search_status != '0' else 'TBD'
                     # Determine display values
                     opac_hit = 'YES' if screening_status and screening_status != '0' else 'NO'
@@ -555,8 +418,7 @@ def client_detail(client_id: int):
                                 ui.label('Review Not Triggered').classes('text-lg font-semibold text-green-800')
 
             # Agents Performance Card
-            # Fetch agent data for a specific client
-            agent_data = get_agent_data(client_identifier)
+            agent_data = detail.agent_data
 
             # Agents Performance Card
             with ui.card().classes('p-6 bg-white rounded-xl shadow-lg border border-gray-100 hover:shadow-xl transition-shadow duration-300'):
@@ -566,7 +428,7 @@ def client_detail(client_id: int):
                         # Researcher Agent Card
                         with ui.card().classes('pl-5 p-6 bg-white rounded-xl shadow-lg border border-blue-500 hover:shadow-xl transition-shadow duration-300 w-full'):
                             researcher_data = agent_data.get('Researcher Agent', {})
-                            ui.label(f"Researcher Agent     |     Total Jobs: 3").classes('text-lg font-semibold text-gray-600')
+                            ui.label(f"Researcher Agent     |     Total Jobs: {researcher_data.get('total_jobs', 0)}").classes('text-lg font-semibold text-gray-600')
                             with ui.column().classes('gap-1 pl-4'):
                                 with ui.row():
                                     ui.label("Time Taken (Sec):").classes('font-bold')
@@ -586,7 +448,7 @@ def client_detail(client_id: int):
                         # KYC Analyst Agent Card
                         with ui.card().classes('pl-5 p-6 bg-white rounded-xl shadow-lg border border-blue-500 hover:shadow-xl transition-shadow duration-300 w-full'):
                             kyc_data = agent_data.get('Analyst Agent', {})
-                            ui.label(f"KYC Analyst Agent     |     Total Jobs: 1").classes('text-lg font-semibold text-gray-600 mt-2')
+                            ui.label(f"KYC Analyst Agent     |     Total Jobs: {kyc_data.get('total_jobs', 0)}").classes('text-lg font-semibold text-gray-600 mt-2')
                             with ui.column().classes('gap-1 pl-4'):
                                 with ui.row():
                                     ui.label("Time Taken (Sec):").classes('font-bold')
@@ -606,7 +468,7 @@ def client_detail(client_id: int):
                         # Screening Agent Card
                         with ui.card().classes('pl-5 p-6 bg-white rounded-xl shadow-lg border border-blue-500 hover:shadow-xl transition-shadow duration-300 w-full'):
                             screening_data = agent_data.get('Screening Agent', {})
-                            ui.label(f"Screening Agent     |     Total Jobs: 2").classes('text-lg font-semibold text-gray-600 mt-2')
+                            ui.label(f"Screening Agent     |     Total Jobs: {screening_data.get('total_jobs', 0)}").classes('text-lg font-semibold text-gray-600 mt-2')
                             with ui.column().classes('gap-1 pl-4'):
                                 with ui.row():
                                     ui.label("Time Taken (Sec):").classes('font-bold')
@@ -623,6 +485,68 @@ def client_detail(client_id: int):
                                     ui.label("Hit Detection Precision:").classes('font-bold')
                                     ui.label(f"{screening_data.get('accuracy', 'N/A')}")
 # -------------------------------------------
+# Agent Performance Page Route and UI
+# -------------------------------------------
+PERFORMANCE_COLUMNS = [
+    {'name': 'agent', 'label': 'Agent', 'field': 'agent', 'align': 'left'},
+    {'name': 'jobs', 'label': 'Steps Run', 'field': 'jobs', 'align': 'center'},
+    {'name': 'failure_rate', 'label': 'Failure Rate', 'field': 'failure_rate', 'align': 'center'},
+    {'name': 'mean_time', 'label': 'Mean Time (Sec)', 'field': 'mean_time', 'align': 'center'},
+    {'name': 'p50_time', 'label': 'p50 Time (Sec)', 'field': 'p50_time', 'align': 'center'},
+    {'name': 'p95_time', 'label': 'p95 Time (Sec)', 'field': 'p95_time', 'align': 'center'},
+    {'name': 'mean_score', 'label': 'Mean Score', 'field': 'mean_score', 'align': 'center'},
+]
+
+def format_bound(seconds):
+    """Display a latency bucket bound; the open-ended bucket has no upper bound."""
+    if seconds is None or pd.isna(seconds):
+        return 'N/A'
+    return f"> {LATENCY_BUCKET_BOUNDS[-1]}" if seconds == float('inf') else f"<= {seconds}"
+
+@ui.page('/agents')
+async def agent_performance():
+    """Route for the fleet-wide agent performance page, read from the agent rollup tables."""
+    performance = await async_db.with_connection(DB_PATH, load_fleet_performance)
+    scores = await async_db.with_connection(DB_PATH, load_score_distribution)
+
+    with ui.element('div').classes('bg-gradient-to-r from-blue-600 to-blue-800 text-white p-8 rounded-xl shadow-2xl mb-8 w-full'):
+        ui.label('Agent Performance').classes('text-4xl font-bold text-center tracking-tight')
+        ui.label('Step latency, scores and failures across all KYC reviews').classes('text-xl text-center mt-2 opacity-90')
+
+    with ui.element('div').classes('container mx-auto px-4'):
+        with ui.card().classes('p-6 bg-white rounded-xl shadow-lg border border-gray-100 w-full mb-8'):
+            ui.label('Agents').classes('text-2xl font-semibold text-gray-800 mb-4 border-b pb-2 border-gray-200')
+            rows = [
+                {
+                    'agent': row['agent'],
+                    'jobs': int(row['jobs']),
+                    'failure_rate': f"{row['failure_rate']:.1%}",
+                    'mean_time': row['mean_time'],
+                    'p50_time': format_bound(row['p50_time']),
+                    'p95_time': format_bound(row['p95_time']),
+                    'mean_score': row['mean_score'] if pd.notna(row['mean_score']) else 'N/A',
+                }
+                for _, row in performance.iterrows()
+            ]
+            ui.table(columns=PERFORMANCE_COLUMNS, rows=rows, row_key='agent').props('flat bordered').classes('w-full')
+
+        with ui.card().classes('p-6 bg-white rounded-xl shadow-lg border border-gray-100 w-full'):
+            ui.label('Score Distribution').classes('text-2xl font-semibold text-gray-800 mb-4 border-b pb-2 border-gray-200')
+            ui.echart({
+                'tooltip': {'trigger': 'axis'},
+                'legend': {},
+                'xAxis': {'type': 'category', 'data': [f"{bucket / 10:.1f}" for bucket in scores.index]},
+                'yAxis': {'type': 'value', 'name': 'Steps'},
+                'series': [
+                    {'name': agent, 'type': 'bar', 'data': [int(steps) for steps in scores[agent]]}
+                    for agent in scores.columns
+                ],
+            }).classes('w-full h-80')
+
+    ui.link('Back to Dashboard', '/').classes('text-blue-600 underline mt-6')
+
+# -------------------------------------------
 # Run the NiceGUI App
 # -------------------------------------------
+migrate(DB_PATH)
 ui.run(reload=False)
\ No newline at end of file
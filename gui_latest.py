@@ -1,27 +1,38 @@
 from nicegui import ui
-import sqlite3
 import pandas as pd
+import async_db
+from schema_migrations import migrate
+from dashboard_query import DashboardQuery
+from dashboard_grid import data_grid, show_page, NAME_CELL_SLOT
 
 DB_PATH = 'Data/KYC_DataBase.db'
 TABLE_NAME = 'OnboardingData'
 ITEMS_PER_PAGE = 5
 
-# Store dashboard state
-dashboard_state = {
-    'page': 1,
-    'name': '',
-    'material': '',
-    'status': '',
-    'case_id': '',
-    'data_source': '',
-}
-
-# Global dictionary to store input fields
-filter_inputs = {}
-
-def get_data():
-    with sqlite3.connect(DB_PATH) as conn:
-        df = pd.read_sql_query(f"SELECT * FROM {TABLE_NAME}", conn)
+def new_dashboard_state():
+    """Fresh pagination and filter state for one dashboard page instance (one per browser tab)."""
+    return {
+        'page': 1,
+        'name': '',
+        'material': '',
+        'status': '',
+        'case_id': '',
+        'data_source': '',
+        'rows_per_page': ITEMS_PER_PAGE,
+        'sort_by': None,
+        'descending': False,
+    }
+
+DASHBOARD_QUERY = DashboardQuery(
+    f"SELECT * FROM {TABLE_NAME}",
+    {'name': 'entity_legal_name', 'material': 'refresh_status', 'status': 'outreach_agent_status', 'case_id': 'client_identifier', 'data_source': 'document_name'},
+    search_table='OnboardingSearch',
+    search_columns={'name': ['entity_legal_name', 'dba_name', 'member_legal_name'], 'data_source': ['document_name']},
+    sort_columns=['onboarding_created_date', 'onboarding_updated_date'],
+)
+
+def format_data(df):
+    """Parse dates and compute the case SLA date for the rows of a page."""
     for col in ['entity_legal_name', 'refresh_status', 'outreach_agent_status', 'document_name']:
         if col in df.columns:
             df[col] = df[col].astype(str)
@@ -32,73 +43,51 @@ def get_data():
         df['case_sla_date'] = ''
     return df
 
-def filter_df(df, name, material, status, case_id, data_source):
-    if name:
-        df = df[df['entity_legal_name'].str.contains(name, case=False, na=False)]
-    if material:
-        df = df[df['refresh_status'].str.contains(material, case=False, na=False)]
-    if status:
-        df = df[df['outreach_agent_status'].str.contains(status, case=False, na=False)]
-    if case_id:
-        df = df[df['client_identifier'].str.contains(case_id, case=False, na=False)]
-    if data_source:
-        df = df[df['document_name'].str.contains(data_source, case=False, na=False)]
-    return df
-
-def update_data_table():
-    """Update the data table dynamically based on the current filters."""
-    df = get_data()
-    filtered = filter_df(
-        df,
-        dashboard_state['name'],
-        dashboard_state['material'],
-        dashboard_state['status'],
-        dashboard_state['case_id'],
-        dashboard_state['data_source'],
-    )
-    total_pages = max(1, (len(filtered) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE)
-    dashboard_state['page'] = max(1, min(dashboard_state['page'], total_pages))
-    paginated = filtered.iloc[(dashboard_state['page']-1)*ITEMS_PER_PAGE:dashboard_state['page']*ITEMS_PER_PAGE]
-
-    # Clear and update the data table
-    data_table.clear()
-    for _, row in paginated.iterrows():
-        with data_table:
-            with ui.row().classes('border-b p-3 items-center hover:bg-gray-50 transition-all rounded-lg'):
-                ui.link(row['entity_legal_name'], f'/client/{row["id"]}').classes('text-blue-600 font-medium underline w-40 text-center')
-                ui.label(row.get('refresh_status', '')).classes('w-40 text-center text-gray-700')
-                ui.label(row.get('outreach_agent_status', '')).classes('w-40 text-center text-gray-700')
-                ui.label(row.get('client_identifier', '')).classes('w-40 text-center text-gray-700')
-                ui.label(row.get('document_name', '')).classes('w-40 text-center text-gray-700')
-                ui.label(str(row.get('onboarding_created_date', ''))[:10]).classes('w-40 text-center text-gray-700')
-                ui.label(str(row.get('case_sla_date', ''))[:10]).classes('w-40 text-center text-gray-700')
-                ui.label(str(row.get('onboarding_updated_date', ''))[:10]).classes('w-40 text-center text-gray-700')
-
-    # Update pagination controls
-    pagination_label.set_text(f"Page {dashboard_state['page']} of {total_pages}")
-    if dashboard_state['page'] == 1:
-        prev_button.disable()
-    else:
-        prev_button.enable()
-
-    if dashboard_state['page'] == total_pages:
-        next_button.disable()
-    else:
-        next_button.enable()
-
-def dashboard_page():
-    df = get_data()
-    filtered = filter_df(
-        df,
-        dashboard_state['name'],
-        dashboard_state['material'],
-        dashboard_state['status'],  # Corrected closing bracket
-        dashboard_state['case_id'],
-        dashboard_state['data_source'],
+async def get_page_data(state):
+    """Fetch the current page of the dashboard, with filters, sorting and paging applied in SQLite."""
+    df, total_rows, state['page'] = await async_db.with_connection(
+        DB_PATH, DASHBOARD_QUERY.fetch_page, dict(state), state['page'], state['rows_per_page'], state['sort_by'], state['descending']
     )
-    total_pages = max(1, (len(filtered) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE)
-    dashboard_state['page'] = max(1, min(dashboard_state['page'], total_pages))
-    paginated = filtered.iloc[(dashboard_state['page']-1)*ITEMS_PER_PAGE:dashboard_state['page']*ITEMS_PER_PAGE]
+    return format_data(df), total_rows
+
+def grid_rows(df):
+    """Turn a page of formatted rows into the row dicts displayed by the overview grid."""
+    return [
+        {
+            'id': int(row['id']),
+            'entity_legal_name': row['entity_legal_name'],
+            'refresh_status': row.get('refresh_status', ''),
+            'outreach_agent_status': row.get('outreach_agent_status', ''),
+            'client_identifier': str(row.get('client_identifier', '')),
+            'document_name': row.get('document_name', ''),
+            'onboarding_created_date': str(row.get('onboarding_created_date', ''))[:10],
+            'case_sla_date': str(row.get('case_sla_date', ''))[:10],
+            'onboarding_updated_date': str(row.get('onboarding_updated_date', ''))[:10],
+        }
+        for _, row in df.iterrows()
+    ]
+
+# Grid columns; `name` is the column the server sorts on (the SLA date is derived, so not sortable)
+GRID_COLUMNS = [
+    {'name': 'entity_legal_name', 'label': 'Client Name', 'field': 'entity_legal_name', 'sortable': True, 'align': 'left'},
+    {'name': 'refresh_status', 'label': 'Material Change', 'field': 'refresh_status', 'sortable': True, 'align': 'center'},
+    {'name': 'outreach_agent_status', 'label': 'Case Status', 'field': 'outreach_agent_status', 'sortable': True, 'align': 'center'},
+    {'name': 'client_identifier', 'label': 'Case ID', 'field': 'client_identifier', 'sortable': True, 'align': 'center'},
+    {'name': 'document_name', 'label': 'Data Source', 'field': 'document_name', 'sortable': True, 'align': 'center'},
+    {'name': 'onboarding_created_date', 'label': 'Case Creation Date', 'field': 'onboarding_created_date', 'sortable': True, 'align': 'center'},
+    {'name': 'case_sla_date', 'label': 'Case SLA Date', 'field': 'case_sla_date', 'align': 'center'},
+    {'name': 'onboarding_updated_date', 'label': 'Case Completion Date', 'field': 'onboarding_updated_date', 'sortable': True, 'align': 'center'},
+]
+
+async def update_data_table(view):
+    """Send the current page of one dashboard page instance to its grid."""
+    paginated, total_rows = await get_page_data(view['state'])
+    show_page(view['table'], view['state'], grid_rows(paginated), total_rows)
+
+async def dashboard_page():
+    state = new_dashboard_state()  # Per page instance, so each browser tab pages and filters independently
+    filter_inputs = {}
+    view = {'state': state}
 
     # Dashboard Header
     with ui.element('div').classes('bg-gradient-to-r from-blue-600 to-blue-800 text-white p-6 rounded-lg shadow-lg mb-6 w-full'):
@@ -109,94 +98,56 @@ def dashboard_page():
     with ui.card().classes('mb-6 p-6 bg-white rounded-lg shadow-md border border-gray-200'):
         ui.label('Filter Controls').classes('text-xl font-semibold text-gray-800 mb-4')
         with ui.row().classes('gap-4 flex-wrap'):
-            filter_inputs['name'] = ui.input('Client Name', value=dashboard_state['name']).props('clearable outlined dense').classes('w-56 bg-gray-50')
-            filter_inputs['material'] = ui.input('Material Change', value=dashboard_state['material']).props('clearable outlined dense').classes('w-56 bg-gray-50')
-            filter_inputs['status'] = ui.input('Case Status', value=dashboard_state['status']).props('clearable outlined dense').classes('w-56 bg-gray-50')
-            filter_inputs['case_id'] = ui.input('Case ID', value=dashboard_state['case_id']).props('clearable outlined dense').classes('w-56 bg-gray-50')
-            filter_inputs['data_source'] = ui.input('Data Source', value=dashboard_state['data_source']).props('clearable outlined dense').classes('w-56 bg-gray-50')
+            filter_inputs['name'] = ui.input('Client Name', value=state['name']).props('clearable outlined dense').classes('w-56 bg-gray-50')
+            filter_inputs['material'] = ui.input('Material Change', value=state['material']).props('clearable outlined dense').classes('w-56 bg-gray-50')
+            filter_inputs['status'] = ui.input('Case Status', value=state['status']).props('clearable outlined dense').classes('w-56 bg-gray-50')
+            filter_inputs['case_id'] = ui.input('Case ID', value=state['case_id']).props('clearable outlined dense').classes('w-56 bg-gray-50')
+            filter_inputs['data_source'] = ui.input('Data Source', value=state['data_source']).props('clearable outlined dense').classes('w-56 bg-gray-50')
 
-            def apply_filters():
+            async def apply_filters():
                 """Apply the filters and update the data table."""
-                dashboard_state['name'] = filter_inputs['name'].value
-                dashboard_state['material'] = filter_inputs['material'].value
-                dashboard_state['status'] = filter_inputs['status'].value
-                dashboard_state['case_id'] = filter_inputs['case_id'].value
-                dashboard_state['data_source'] = filter_inputs['data_source'].value
-                dashboard_state['page'] = 1  # Reset to the first page
-                update_data_table()
-
-            def reset_filters():
+                state['name'] = filter_inputs['name'].value
+                state['material'] = filter_inputs['material'].value
+                state['status'] = filter_inputs['status'].value
+                state['case_id'] = filter_inputs['case_id'].value
+                state['data_source'] = filter_inputs['data_source'].value
+                state['page'] = 1  # Reset to the first page
+                await update_data_table(view)
+
+            async def reset_filters():
                 """Reset the filters and update the data table."""
-                dashboard_state.update({'name': '', 'material': '', 'status': '', 'case_id': '', 'data_source': '', 'page': 1})
+                state.update({'name': '', 'material': '', 'status': '', 'case_id': '', 'data_source': '', 'page': 1})
                 filter_inputs['name'].set_value('')
                 filter_inputs['material'].set_value('')
                 filter_inputs['status'].set_value('')
                 filter_inputs['case_id'].set_value('')
                 filter_inputs['data_source'].set_value('')
-                update_data_table()
+                await update_data_table(view)
 
             with ui.row().classes('gap-4'):
                 ui.button('Apply Filters', on_click=apply_filters).classes('bg-blue-600 text-white px-4 py-2 rounded-md hover:bg-blue-700 transition')
                 ui.button('Reset Filters', on_click=reset_filters).classes('bg-gray-600 text-white px-4 py-2 rounded-md hover:bg-gray-700 transition')
 
     # Data Table Section
-    global data_table
-    with ui.card().classes('mb-6 p-6 bg-white rounded-lg shadow-md border border-gray-200'):
+    with ui.card().classes('mb-6 p-6 bg-white rounded-lg shadow-md border border-gray-200 w-full'):
         ui.label('KYC Data Overview').classes('text-xl font-semibold text-gray-800 mb-4')
-        with ui.row().classes('bg-blue-50 font-semibold p-3 rounded-md shadow-sm text-gray-800'):
-            for col in ['Client Name', 'Material Change', 'Case Status', 'Case ID', 'Data Source', 'Case Creation Date', 'Case SLA Date', 'Case Completion Date']:
-                ui.label(col).classes('w-40 text-center')  # Ensure consistent width for all columns
-        
-        data_table = ui.column()
-
-    for _, row in paginated.iterrows():
-        with data_table:
-            with ui.row().classes('border-b p-3 items-center hover:bg-gray-50 transition-all rounded-lg'):
-                ui.link(row['entity_legal_name'], f'/client/{row["id"]}').classes('text-blue-600 font-medium underline w-40 text-center')
-                ui.label(row.get('refresh_status', '')).classes('w-40 text-center text-gray-700')
-                ui.label(row.get('outreach_agent_status', '')).classes('w-40 text-center text-gray-700')
-                ui.label(row.get('client_identifier', '')).classes('w-40 text-center text-gray-700')
-                ui.label(row.get('document_name', '')).classes('w-40 text-center text-gray-700')
-                ui.label(str(row.get('onboarding_created_date', ''))[:10]).classes('w-40 text-center text-gray-700')
-                ui.label(str(row.get('case_sla_date', ''))[:10]).classes('w-40 text-center text-gray-700')
-                ui.label(str(row.get('onboarding_updated_date', ''))[:10]).classes('w-40 text-center text-gray-700')
+        view['table'] = data_grid(GRID_COLUMNS, state, lambda: update_data_table(view))
+        view['table'].add_slot('body-cell-entity_legal_name', NAME_CELL_SLOT)
 
-    # Pagination Section
-    with ui.row().classes('mt-4 justify-center items-center'):
-        def prev_page():
-            """Navigate to the previous page and update the data table."""
-            if dashboard_state['page'] > 1:
-                dashboard_state['page'] -= 1
-                update_data_table()
-
-        def next_page():
-            """Navigate to the next page and update the data table."""
-            dashboard_state['page'] += 1
-            update_data_table()
-
-        global prev_button, next_button, pagination_label
-        prev_button = ui.button('Previous', on_click=prev_page).classes('bg-blue-600 text-white px-4 py-2 rounded-md hover:bg-blue-700 transition')
-        pagination_label = ui.label(f'Page {dashboard_state["page"]} of {total_pages}').classes('mx-4 text-lg text-gray-700')
-        next_button = ui.button('Next', on_click=next_page).classes('bg-blue-600 text-white px-4 py-2 rounded-md hover:bg-blue-700 transition')
-
-        if dashboard_state['page'] <= 1:
-            prev_button.disable()
-        if dashboard_state['page'] >= total_pages:
-            next_button.disable()
+    await update_data_table(view)
 
 @ui.page('/')
-def main_dashboard():
-    dashboard_page()
+async def main_dashboard():
+    await dashboard_page()
 
 @ui.page('/client/{client_id}')
-def client_detail(client_id: int):
+async def client_detail(client_id: int):
     # Retrieve client details from the OnboardingData table using client_id
-    with sqlite3.connect(DB_PATH) as conn:
-        onboarding_df = pd.read_sql_query(
-            "SELECT * FROM OnboardingData WHERE id = ?",
-            conn,
-            params=(client_id,)
-        )
+    onboarding_df = await async_db.read_sql(
+        DB_PATH,
+        "SELECT * FROM OnboardingData WHERE id = ?",
+        (client_id,),
+    )
     
     if onboarding_df.empty:
         onboarding_data = {
@@ -212,12 +163,11 @@ def client_detail(client_id: int):
 
     # Retrieve details from the KycRefreshData table using client_identifier as the foreign key
     client_identifier = onboarding_data.get('client_identifier', 'N/A')
-    with sqlite3.connect(DB_PATH) as conn:
-        refresh_df = pd.read_sql_query(
-            "SELECT * FROM KycRefreshData WHERE client_identifier = ?",
-            conn,
-            params=(client_identifier,)
-        )
+    refresh_df = await async_db.read_sql(
+        DB_PATH,
+        "SELECT * FROM KycRefreshData WHERE client_identifier = ?",
+        (client_identifier,),
+    )
     
     if refresh_df.empty:
         refresh_data = {
@@ -277,4 +227,5 @@ def client_detail(client_id: int):
                     with ui.row().classes('gap-4'):
                         ui.label(f"KYC Refresh Updated Date: {refresh_data.get('onboarding_updated_date', 'N/A')}").classes('text-lg text-gray-700')
 
+migrate(DB_PATH)
 ui.run(reload=False)
\ No newline at end of file
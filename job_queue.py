@@ -0,0 +1,154 @@
+"""Persistent queue of KYC refresh runs and the worker pool that executes them in the GUI process.
+
+Jobs live in the RefreshJob table (see schema_migrations), so requested runs survive a restart.
+Workers claim the queued job with the earliest SLA date, run `run_kyc_workflow` for it, and on
+failure requeue it with exponential backoff until `max_attempts` is reached.
+"""
+
+import asyncio
+import time
+
+import async_db
+
+JOB_TABLE = "RefreshJob"
+# Workflows run at the same time by one worker pool
+JOB_CONCURRENCY = 4
+MAX_ATTEMPTS = 3
+# Retry delay doubles after each failed attempt, up to the maximum
+RETRY_BASE_DELAY_SEC = 30
+RETRY_MAX_DELAY_SEC = 900
+# Idle workers look for due retries at least this often
+IDLE_POLL_SEC = 10
+
+# Case SLA date of a client: 90 days after its latest refresh case, else after onboarding
+SLA_DATE_SQL = """
+    SELECT COALESCE(
+        (SELECT date(KycRefresh_created_date, '+90 days') FROM KycRefreshData
+         WHERE client_identifier = ? ORDER BY id DESC LIMIT 1),
+        (SELECT date(onboarding_created_date, '+90 days') FROM OnboardingData
+         WHERE client_identifier = ? ORDER BY id LIMIT 1)
+    )
+"""
+
+
+def enqueue(conn, client_identifiers):
+    """Queue a refresh for each client that has no queued or running job; return the number queued."""
+    now = time.time()
+    queued = 0
+    for client_identifier in client_identifiers:
+        client_identifier = str(client_identifier)
+        sla_date = conn.execute(SLA_DATE_SQL, (client_identifier, client_identifier)).fetchone()[0]
+        cursor = conn.execute(
+            f"""
+            INSERT OR IGNORE INTO {JOB_TABLE} (client_identifier, sla_date, max_attempts, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (client_identifier, sla_date, MAX_ATTEMPTS, now, now),
+        )
+        queued += cursor.rowcount
+    conn.commit()
+    return queued
+
+
+def claim_next(conn):
+    """Mark the due queued job with the earliest SLA date as running and return it, or None."""
+    now = time.time()
+    row = conn.execute(
+        f"""
+        UPDATE {JOB_TABLE}
+        SET status = 'running', attempts = attempts + 1, updated_at = ?
+        WHERE id = (
+            SELECT id FROM {JOB_TABLE}
+            WHERE status = 'queued' AND not_before <= ?
+            ORDER BY sla_date IS NULL, sla_date, id
+            LIMIT 1
+        )
+        RETURNING id, client_identifier, attempts, max_attempts
+        """,
+        (now, now),
+    ).fetchone()
+    conn.commit()
+    if row is None:
+        return None
+    return dict(zip(("id", "client_identifier", "attempts", "max_attempts"), row))
+
+
+def finish(conn, job, error=None, retry=True):
+    """Record the outcome of a claimed job; failed jobs are requeued with backoff while attempts remain."""
+    now = time.time()
+    if error is None:
+        conn.execute(f"UPDATE {JOB_TABLE} SET status = 'completed', last_error = NULL, updated_at = ? WHERE id = ?", (now, job["id"]))
+    elif retry and job["attempts"] < job["max_attempts"]:
+        delay = min(RETRY_BASE_DELAY_SEC * 2 ** (job["attempts"] - 1), RETRY_MAX_DELAY_SEC)
+        conn.execute(
+            f"UPDATE {JOB_TABLE} SET status = 'queued', not_before = ?, last_error = ?, updated_at = ? WHERE id = ?",
+            (now + delay, str(error), now, job["id"]),
+        )
+    else:
+        conn.execute(f"UPDATE {JOB_TABLE} SET status = 'failed', last_error = ?, updated_at = ? WHERE id = ?", (str(error), now, job["id"]))
+    conn.commit()
+
+
+def requeue_interrupted(conn):
+    """Put jobs left running by a stopped process back in the queue."""
+    conn.execute(f"UPDATE {JOB_TABLE} SET status = 'queued', updated_at = ? WHERE status = 'running'", (time.time(),))
+    conn.commit()
+
+
+class JobWorkerPool:
+    """Asyncio workers running queued refresh jobs, at most `concurrency` at a time."""
+
+    def __init__(self, db_path, concurrency=JOB_CONCURRENCY):
+        self.db_path = db_path
+        self.concurrency = concurrency
+        self.wakeup = asyncio.Event()
+        self.tasks = []
+        self.orchestrator_agent = None
+
+    async def enqueue(self, client_identifiers):
+        """Queue refreshes for the clients and wake the idle workers; return the number queued."""
+        queued = await async_db.with_connection(self.db_path, enqueue, list(client_identifiers))
+        self.wakeup.set()
+        return queued
+
+    async def start(self):
+        await async_db.with_connection(self.db_path, requeue_interrupted)
+        self.tasks = [asyncio.create_task(self.work()) for _ in range(max(1, self.concurrency))]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def work(self):
+        while True:
+            # Cleared before claiming, so a job enqueued while the claim runs still wakes this worker
+            self.wakeup.clear()
+            job = await async_db.with_connection(self.db_path, claim_next)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), IDLE_POLL_SEC)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run(job)
+
+    async def run(self, job):
+        error, retry = None, True
+        try:
+            # Imported here so the GUI starts without the agent dependencies until a job runs
+            from main import initialize_agent, run_kyc_workflow
+
+            if self.orchestrator_agent is None:
+                self.orchestrator_agent = initialize_agent()
+            summary = await run_kyc_workflow(job["client_identifier"], self.orchestrator_agent)
+            if summary["status"] == "skipped":
+                # No data to review; another attempt would be skipped too
+                error, retry = summary["error"] or "skipped", False
+            elif summary["status"] != "completed":
+                error = summary["error"] or summary["status"]
+        except Exception as e:
+            error = e
+        print(f"Refresh job {job['id']} for client {job['client_identifier']}: {'completed' if error is None else error}")
+        await async_db.with_connection(self.db_path, finish, job, error, retry)
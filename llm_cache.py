@@ -0,0 +1,197 @@
+"""Persistent cache of agent responses for the KYC processing steps."""
+
+import asyncio
+import contextlib
+import contextvars
+import hashlib
+import json
+import sqlite3
+import time
+
+from agents import Runner
+
+CACHE_ENABLED = True
+CACHE_DB_PATH = "Data/llm_cache.db"
+CACHE_TTL_SEC = 7 * 24 * 3600  # Entries older than this are never served
+CACHE_MAX_ENTRIES = 5000  # Least recently used entries beyond this are evicted
+
+# (client_identifier, data fingerprint) of the workflow running in the current task
+_cache_scope = contextvars.ContextVar("llm_cache_scope", default=(None, ""))
+
+
+class CachedRunResult:
+    """Runner result restored from the cache, exposing `final_output` and `to_input_list()`."""
+
+    def __init__(self, final_output, input_list):
+        self.final_output = final_output
+        self._input_list = input_list
+
+    def to_input_list(self):
+        return list(self._input_list)
+
+
+def _hash(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _json_default(value):
+    """Serialize structured agent outputs (pydantic models) as their fields, anything else as text."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+def _connect():
+    conn = sqlite3.connect(CACHE_DB_PATH)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            cache_key TEXT PRIMARY KEY,
+            client_identifier TEXT,
+            prompt_name TEXT,
+            final_output TEXT,
+            input_list TEXT,
+            created_at REAL,
+            last_accessed REAL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_client ON llm_cache (client_identifier)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (last_accessed)")
+    return conn
+
+
+@contextlib.contextmanager
+def _connection():
+    """Cache connection that commits on success and is always closed.
+
+    A sqlite3 connection's own context manager only commits or rolls back; it never closes.
+    """
+    conn = _connect()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def data_fingerprint(*parts):
+    """Hash the client data a workflow reads, so cached responses expire when it changes."""
+    return _hash(parts)
+
+
+def set_cache_scope(client_identifier, fingerprint=""):
+    """Tag cache entries written by the current workflow task with the client and its data fingerprint."""
+    _cache_scope.set((client_identifier, fingerprint))
+
+
+def cache_key(agent, prompt_name, input_items):
+    """Build the cache key from the agent, the prompt constant and the input list."""
+    client_identifier, fingerprint = _cache_scope.get()
+    agent_id = [getattr(agent, "name", ""), str(getattr(agent, "model", "")), str(getattr(agent, "instructions", ""))]
+    return _hash([agent_id, prompt_name, client_identifier, fingerprint, _hash(input_items)])
+
+
+def get(key):
+    """Return the cached result for `key`, or None if missing or expired."""
+    now = time.time()
+    with _connection() as conn:
+        row = conn.execute(
+            "SELECT final_output, input_list, created_at FROM llm_cache WHERE cache_key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if now - row[2] > CACHE_TTL_SEC:
+            conn.execute("DELETE FROM llm_cache WHERE cache_key = ?", (key,))
+            return None
+        conn.execute("UPDATE llm_cache SET last_accessed = ? WHERE cache_key = ?", (now, key))
+    return CachedRunResult(json.loads(row[0]), json.loads(row[1]))
+
+
+def discard(key):
+    """Drop one cached response."""
+    with _connection() as conn:
+        conn.execute("DELETE FROM llm_cache WHERE cache_key = ?", (key,))
+
+
+def put(key, prompt_name, result):
+    """Store a Runner result under `key` and evict expired and least recently used entries."""
+    client_identifier, _ = _cache_scope.get()
+    now = time.time()
+    with _connection() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                client_identifier,
+                prompt_name,
+                json.dumps(result.final_output, default=_json_default),
+                json.dumps(result.to_input_list(), default=str),
+                now,
+                now,
+            ),
+        )
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - CACHE_TTL_SEC,))
+        conn.execute(
+            """
+            DELETE FROM llm_cache WHERE cache_key IN (
+                SELECT cache_key FROM llm_cache ORDER BY last_accessed DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (CACHE_MAX_ENTRIES,),
+        )
+
+
+def invalidate(client_identifier=None):
+    """Drop cached responses for one client, or the whole cache when no client is given."""
+    with _connection() as conn:
+        if client_identifier is None:
+            conn.execute("DELETE FROM llm_cache")
+        else:
+            conn.execute("DELETE FROM llm_cache WHERE client_identifier = ?", (str(client_identifier),))
+
+
+def is_valid(result, validate):
+    """True when there is no `validate` or it accepts the result's final_output without raising."""
+    if validate is None:
+        return True
+    try:
+        validate(result.final_output)
+    except Exception:
+        return False
+    return True
+
+
+async def cached_run(agent, prompt_name, input, validate=None):
+    """Run the agent on `input`, serving a cached response for the same agent, prompt and input.
+
+    With `validate`, only responses whose final_output it accepts are served from or stored in the
+    cache, so a retry never replays an invalid answer.
+    """
+    if not CACHE_ENABLED:
+        return await Runner.run(agent, input=input)
+
+    key = cache_key(agent, prompt_name, input)
+    try:
+        cached = await asyncio.to_thread(get, key)
+    except sqlite3.Error as e:
+        print(f"Warning: LLM cache lookup failed: {e}")
+        cached = None
+    if cached is not None:
+        if is_valid(cached, validate):
+            print(f"LLM cache hit for {prompt_name}")
+            return cached
+        print(f"Warning: Cached {prompt_name} response is invalid; running the agent again")
+        try:
+            await asyncio.to_thread(discard, key)
+        except sqlite3.Error as e:
+            print(f"Warning: Could not drop the invalid {prompt_name} response: {e}")
+
+    result = await Runner.run(agent, input=input)
+    if not is_valid(result, validate):
+        return result
+    try:
+        await asyncio.to_thread(put, key, prompt_name, result)
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        print(f"Warning: Could not cache {prompt_name} response: {e}")
+    return result
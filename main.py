@@ -2,7 +2,7 @@
 
 import time
 import asyncio
-import json
+import argparse
 import sqlite3  # Add import for database interaction
 from tools.data_validator import validator
 from tools.data_fuzzy_match import fuzzy_tool, person_info
@@ -22,45 +22,103 @@ from utils.kyc_processor import (
     scan_profiles,
     adverse_media,
     generate_final_report,
+    MergedResult,
 )
+from step_scheduler import WorkflowStep, run_step_graph
+import db_writer
+import llm_cache
+import progress_bus
+from change_sets import build_change_sets
+from schema_migrations import migrate
+from materiality import assess_materiality, is_decisive, FastPathResult
+from workflow_checkpoint import discard_stale_checkpoints, load_checkpoints, save_checkpoint, clear_checkpoints
 
 import warnings
 warnings.filterwarnings('ignore')
 
+# Number of client workflows allowed to run at once in batch mode
+BATCH_CONCURRENCY = 5
+
 
 def initialize_agent():
     """Initialize the orchestration agent with required tools."""
     return run_interaction_agent(information_extractor, validator, fuzzy_tool, person_info)
 
-async def run_kyc_workflow():
-    """Run the complete KYC workflow."""
-    # Initialize agent
-    orchestrator_agent = initialize_agent()
-    
-    # Fetch NEW_DOC dynamically from the database
-    client_identifier = CLIENT_ID
-    NEW_DOC = None
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
+def record_update_data(result, agent_eval):
+    """Record the row updated by the analyst agent for evaluation."""
+    # update_data is the validated AnalystUpdate of step 4 (see structured_output)
+    update_info = getattr(result, "update_data", None)
+
+    # A single update dict is handled like a one-item list
+    if isinstance(update_info, dict):
+        update_info = [update_info]
+    if isinstance(update_info, list):
+        for info in update_info:
+            client_id = info.get("client_identifier")
+            update_dict = info.get("update_dict")
+            if client_id and update_dict:
+                # Use insert_kyc_data instead of update_kyc_data
+                # updated_rows = insert_kyc_data(client_id, update_dict)
+                # print(f"Database row inserted for client_identifier={client_id}, rows affected: {updated_rows}")
+                updated_row = fetch_kyc_data(client_id)
+                # print("Inserted data:", updated_row)
+                agent_eval.set_updated_data(updated_row)
+            else:
+                print("Warning: update_info missing client_identifier or update_dict.")
+    else:
+        print("Warning: No update_info returned from agent. Skipping DB update.")
+
+def load_onboarding_snapshot(client_identifier):
+    """Return the client's extracted data document name and its OnboardingData rows."""
+    with sqlite3.connect(DB_PATH) as conn:
+        row = conn.execute(
             "SELECT extracted_data FROM OnboardingData WHERE client_identifier = ?",
             (client_identifier,)
-        )
-        result = cursor.fetchone()
-        if result:
-            NEW_DOC = result[0]
-        else:
+        ).fetchone()
+        if not row:
             raise ValueError(f"No extracted_data found for client_identifier: {client_identifier}")
+        # Snapshot of the client's onboarding data; cached agent responses expire when it changes
+        onboarding_rows = conn.execute(
+            "SELECT * FROM OnboardingData WHERE client_identifier = ? ORDER BY id",
+            (client_identifier,)
+        ).fetchall()
+    return row[0], onboarding_rows
+
+async def run_kyc_workflow(client_identifier=CLIENT_ID, orchestrator_agent=None):
+    """Run the complete KYC workflow for one client and return a summary of the run."""
+    # Initialize agent (batch runs share one orchestrator across clients)
+    if orchestrator_agent is None:
+        orchestrator_agent = initialize_agent()
+
+    run_summary = {
+        "client_identifier": client_identifier,
+        "status": "failed",
+        "error": None,
+        "duration_sec": 0.0,
+    }
+
+    # Fetch NEW_DOC dynamically from the database, off the event loop
+    try:
+        NEW_DOC, onboarding_rows = await asyncio.to_thread(load_onboarding_snapshot, client_identifier)
     except Exception as e:
         print(f"Error fetching NEW_DOC from database: {e}")
-        return
-    finally:
-        conn.close()
+        run_summary["status"] = "skipped"
+        run_summary["error"] = str(e)
+        return run_summary
 
     # Load the new profile data
     profile = load.load_document(f"{EXTRACTED_DATA_PATH}{NEW_DOC}")
     # print(f"Loaded new profile data: {profile}")
+    fingerprint = llm_cache.data_fingerprint(onboarding_rows, NEW_DOC, profile)
+    llm_cache.set_cache_scope(client_identifier, fingerprint)
+    # Steps completed by an earlier, interrupted run of this client are not repeated
+    await db_writer.write(DB_PATH, discard_stale_checkpoints, client_identifier, fingerprint)
+    checkpoints = await asyncio.to_thread(load_checkpoints, client_identifier, fingerprint)
+    try:
+        materiality = await asyncio.to_thread(assess_materiality, client_identifier, NEW_DOC)
+    except Exception as e:
+        print(f"Warning: Deterministic materiality check failed, using the Researcher agent: {e}")
+        materiality = None
     # Start the workflow timer
     t0 = time.time()
     
@@ -77,146 +135,223 @@ async def run_kyc_workflow():
         "Adverse Media (Screening Agent)",
         "Final Report (Orchestrator Agent)"
     ]
+    # Index in step_names of each workflow step, for steps restored from a checkpoint
+    step_indexes = {
+        "process_existing_data": 0,
+        "extract_new_data": 1,
+        "check_eligibility": 2,
+        "update_profile": 3,
+        "scan_criminal_records": 4,
+        "scan_profiles": 5,
+        "adverse_media": 6,
+        "generate_final_report": 7,
+    }
     eval_steps = evaluate_agent_steps(step_names)
     agent_eval = AgentEvaluation(client_identifier)
+    # Live progress for GUI pages running in this process
+    progress_bus.publish(client_identifier, "run_start", steps=step_names)
+    step_started = {}
+
+    def step_end(index, status, output=None):
+        """Publish the end of a step with its duration and the leading part of its output."""
+        duration = round(time.time() - step_started.get(index, time.time()), 2)
+        progress_bus.publish(client_identifier, "step_end", step=step_names[index], status=status,
+                             duration_sec=duration, output=output)
+
+    async def run_step(index, step, reference=None, status="completed"):
+        """Run one workflow step under its agent evaluation timer."""
+        eval_steps[index].start()
+        step_started[index] = time.time()
+        progress_bus.publish(client_identifier, "step_start", step=step_names[index])
+        result = await step
+        print(f"Result of {step_names[index]}:", result)
+        eval_steps[index].end(result=getattr(result, "final_output", str(result)), reference=reference)
+        if status != "completed":
+            eval_steps[index].status = status
+        agent_eval.add_step(eval_steps[index])
+        step_end(index, status, progress_bus.partial_output(result))
+        return result
+
+    async def restored(result):
+        return result
+
+    async def run_update_profile(result3):
+        result4 = await run_step(3, update_profile(orchestrator_agent, result3), profile)
+        await asyncio.to_thread(record_update_data, result4, agent_eval)
+        return result4
+
+    async def run_final_report(result4, result5, result6, result7):
+        # Screening branches forked from step 4; merge them back into one conversation
+        screening = MergedResult(result4, [result5, result6, result7])
+        result8 = await run_step(7, generate_final_report(orchestrator_agent, screening, client_identifier), profile)
+        return result8
+
+    async def fast_path_eligibility(assessment):
+        return FastPathResult(assessment)
+
+    def checkpointed(name, func):
+        """Restore a step from its checkpoint, or run it and checkpoint its result.
+
+        A restored step is logged, evaluated and published like a run step, with status "restored".
+        """
+        async def run(*inputs):
+            if name in checkpoints:
+                print(f"Resuming {name} from checkpoint")
+                index = step_indexes[name]
+                result = await run_step(index, restored(checkpoints[name]),
+                                        profile if index > 0 else None, status="restored")
+                if name == "update_profile":
+                    await asyncio.to_thread(record_update_data, result, agent_eval)
+                return result
+            result = await func(*inputs)
+            await db_writer.write(DB_PATH, save_checkpoint, client_identifier, name, fingerprint, result)
+            return result
+        return run
+
+    if is_decisive(materiality):
+        # The deterministic diff settles materiality; steps 1-3 need no Researcher agent call
+        print(f"Materiality fast path: {materiality['verdict']} for client {client_identifier}")
+        workflow = [
+            WorkflowStep("check_eligibility", lambda: run_step(2, fast_path_eligibility(materiality), profile)),
+        ]
+    else:
+        workflow = [
+            WorkflowStep("process_existing_data",
+                         lambda: run_step(0, process_existing_data(orchestrator_agent, client_identifier))),
+            WorkflowStep("extract_new_data",
+                         lambda result1: run_step(1, extract_new_data(orchestrator_agent, result1, profile), profile),
+                         ["process_existing_data"]),
+            WorkflowStep("check_eligibility",
+                         lambda result2: run_step(2, check_eligibility(orchestrator_agent, result2), profile),
+                         ["extract_new_data"]),
+        ]
+    # Steps 5-7 only depend on the profile established by step 4, so they run concurrently
+    workflow += [
+        WorkflowStep("update_profile", run_update_profile, ["check_eligibility"]),
+        WorkflowStep("scan_criminal_records",
+                     lambda result4: run_step(4, scan_criminal_records(orchestrator_agent, result4), profile),
+                     ["update_profile"]),
+        WorkflowStep("scan_profiles",
+                     lambda result4: run_step(5, scan_profiles(orchestrator_agent, result4, client_identifier), profile),
+                     ["update_profile"]),
+        WorkflowStep("adverse_media",
+                     lambda result4: run_step(6, adverse_media(orchestrator_agent, result4), profile),
+                     ["update_profile"]),
+        WorkflowStep("generate_final_report", run_final_report,
+                     ["update_profile", "scan_criminal_records", "scan_profiles", "adverse_media"]),
+    ]
+
+    workflow = [WorkflowStep(step.name, checkpointed(step.name, step.func), step.depends_on) for step in workflow]
 
     # Execute each step of the KYC process
     try:
-        eval_steps[0].start()
-        result1 = await process_existing_data(orchestrator_agent, client_identifier)
-        print("Result of process_existing_data:", result1)
-        eval_steps[0].end(result=getattr(result1, "final_output", str(result1)))
-        agent_eval.add_step(eval_steps[0])
-
-        eval_steps[1].start()
-        result2 = await extract_new_data(orchestrator_agent, result1, profile)
-        print("Result of extract_new_data:", result2)
-        eval_steps[1].end(result=getattr(result2, "final_output", str(result2)), reference=profile)
-        agent_eval.add_step(eval_steps[1])
-
-        eval_steps[2].start()
-        result3 = await check_eligibility(orchestrator_agent, result2)
-        print("Result of check_eligibility:", result3)
-        eval_steps[2].end(result=getattr(result3, "final_output", str(result3)), reference=profile)
-        agent_eval.add_step(eval_steps[2])
-
-        eval_steps[3].start()
-        result4 = await update_profile(orchestrator_agent, result3)
-        print("Result of update_profile:", result4)
-        eval_steps[3].end(result=getattr(result4, "final_output", str(result4)), reference=profile)
-        agent_eval.add_step(eval_steps[3])
-
-        # --- NEW: Parse update data from agent and update DB ---
-        # Try to extract update_info from result in various formats
-        update_info = getattr(result4, "update_data", None)
-        if not update_info:
-            # Try to parse from final_output if present
-            final_output = getattr(result4, "final_output", None)
-            if final_output:
-                try:
-                    # Try to load as JSON (could be dict or list)
-                    parsed = json.loads(final_output)
-                    update_info = parsed
-                except Exception:
-                    # Try to extract JSON from string if agent returned a string with JSON inside
-                    import re
-                    match = re.search(r'(\{.*"update_dict".*\})', final_output, re.DOTALL)
-                    if match:
-                        try:
-                            update_info = json.loads(match.group(1))
-                        except Exception:
-                            update_info = None
-
-        # If update_info is a list, process each item
-        if isinstance(update_info, list):
-            for info in update_info:
-                client_id = info.get("client_identifier")
-                update_dict = info.get("update_dict")
-                if client_id and update_dict:
-                    # Use insert_kyc_data instead of update_kyc_data
-                    # updated_rows = insert_kyc_data(client_id, update_dict)
-                    # print(f"Database row inserted for client_identifier={client_id}, rows affected: {updated_rows}")
-                    updated_row = fetch_kyc_data(client_id)
-                    # print("Inserted data:", updated_row)
-                    agent_eval.set_updated_data(updated_row)
-                else:
-                    print("Warning: update_info missing client_identifier or update_dict.")
-        elif isinstance(update_info, dict):
-            client_id = update_info.get("client_identifier")
-            update_dict = update_info.get("update_dict")
-            if client_id and update_dict:
-                # Use insert_kyc_data instead of update_kyc_data
-                # updated_rows = insert_kyc_data(client_id, update_dict)
-                # print(f"Database row inserted for client_identifier={client_id}, rows affected: {updated_rows}")
-                updated_row = fetch_kyc_data(client_id)
-                # print("Inserted data:", updated_row)
-                agent_eval.set_updated_data(updated_row)
-            else:
-                print("Warning: update_info missing client_identifier or update_dict.")
-        else:
-            print("Warning: No update_info returned from agent. Skipping DB update.")
-
-        eval_steps[4].start()
-        result5 = await scan_criminal_records(orchestrator_agent, result4)
-        print("Result of scan_criminal_records:", result5)
-        eval_steps[4].end(result=getattr(result5, "final_output", str(result5)), reference=profile)
-        agent_eval.add_step(eval_steps[4])
-
-        eval_steps[5].start()
-        result6 = await scan_profiles(orchestrator_agent, result5)
-        print("Result of scan_profiles:", result6)
-        eval_steps[5].end(result=getattr(result6, "final_output", str(result6)), reference=profile)
-        agent_eval.add_step(eval_steps[5])
-
-        eval_steps[6].start()
-        result7 = await adverse_media(orchestrator_agent, result6)
-        print("Result of scan_profiles:", result7)
-        eval_steps[6].end(result=getattr(result7, "final_output", str(result7)), reference=profile)
-        agent_eval.add_step(eval_steps[5])
-
-        eval_steps[7].start()
-        result8 = await generate_final_report(orchestrator_agent, result7, client_identifier)
-        final_output = getattr(result8, "final_output", None)
-
-        # Try to parse the result if it's a dict with a 'content' key
-        if isinstance(final_output, dict) and "content" in final_output:
-            # Try to extract JSON from the content string
-            import re, json
-            match = re.search(r'\{.*\}', final_output["content"], re.DOTALL)
-            if match:
-                try:
-                    parsed_result = json.loads(match.group(0))
-                    # Use parsed_result as your result
-                except Exception:
-                    print("Could not parse JSON from agent content.")
-            else:
-                print("No JSON found in agent content.")
-        elif isinstance(final_output, dict):
-            # Handle as usual
-            pass
-        else:
-            # Handle as string or other type
-            pass
-
-        eval_steps[7].end(result=getattr(result8, "final_output", str(result8)), reference=profile)
-        agent_eval.add_step(eval_steps[6])
+        await run_step_graph(workflow)
+        await db_writer.write(DB_PATH, clear_checkpoints, client_identifier)
+        run_summary["status"] = "completed"
 
     except Exception as e:
-        # Mark the current step as failed
-        for step in eval_steps:
+        # Mark the running steps as failed (several may be in flight at once)
+        for index, step in enumerate(eval_steps):
             if step.status == "running":
                 step.end(error=e)
                 agent_eval.add_step(step)
-                break
+                step_end(index, "failed", str(e))
         print(f"Error during KYC workflow: {e}")
+        run_summary["error"] = str(e)
 
     # Calculate total time
     total_time = time.time() - t0
+    run_summary["duration_sec"] = round(total_time, 2)
     print(f"\nTotal processing time: {int(total_time)} sec")
     print("\n=== Demo Complete ===\n")
 
-    # Generate agent evaluation report
-    agent_eval.report()
+    # Generate agent evaluation report; its log row is normalized into AgentStepLog by a trigger
+    await db_writer.call(DB_PATH, agent_eval.report)
+    progress_bus.publish(client_identifier, "run_end", status=run_summary["status"],
+                         duration_sec=run_summary["duration_sec"], error=run_summary["error"])
+    return run_summary
+
+def load_client_identifiers(query="SELECT DISTINCT client_identifier FROM OnboardingData", params=()):
+    """Return the client_identifiers selected by a query over the KYC database."""
+    with sqlite3.connect(DB_PATH) as conn:
+        rows = conn.execute(query, params).fetchall()
+    return [str(row[0]) for row in rows if row[0] is not None]
+
+async def run_kyc_batch(client_identifiers=None, concurrency=BATCH_CONCURRENCY):
+    """Run the KYC workflow for many clients, at most `concurrency` at a time."""
+    if client_identifiers is None:
+        client_identifiers = load_client_identifiers()
+    orchestrator_agent = initialize_agent()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(client_identifier):
+        async with semaphore:
+            try:
+                return await run_kyc_workflow(client_identifier, orchestrator_agent)
+            except Exception as e:
+                # Never let one client take down the rest of the batch
+                return {
+                    "client_identifier": client_identifier,
+                    "status": "failed",
+                    "error": str(e),
+                    "duration_sec": 0.0,
+                }
+
+    t0 = time.time()
+    results = await asyncio.gather(*(run_one(cid) for cid in client_identifiers))
+    elapsed = time.time() - t0
+
+    print("\n=== KYC Batch Summary ===\n")
+    for summary in results:
+        line = f"{summary['client_identifier']}: {summary['status']} ({summary['duration_sec']} sec)"
+        if summary["error"]:
+            line += f" - {summary['error']}"
+        print(line)
+    completed = sum(1 for summary in results if summary["status"] == "completed")
+    throughput = len(results) / (elapsed / 60) if elapsed > 0 else 0.0
+    print(
+        f"\n{completed}/{len(results)} clients completed in {int(elapsed)} sec "
+        f"(concurrency={concurrency}, {throughput:.2f} clients/min)"
+    )
+    return results
+
+def parse_args():
+    """Parse command line arguments for single-client or batch runs."""
+    parser = argparse.ArgumentParser(description="Event driven KYC review using AI agents")
+    parser.add_argument("client_identifiers", nargs="*",
+                        help="client_identifiers to review (defaults to CLIENT_ID from utils.config)")
+    parser.add_argument("--all", action="store_true",
+                        help="review every client_identifier in OnboardingData")
+    parser.add_argument("--query",
+                        help="SQL SELECT returning the client_identifiers to review")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help="number of workflows to run at once in batch mode")
+    parser.add_argument("--changed-only", action="store_true",
+                        help="with --all, only review clients whose extracted data differs from their profile")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="ignore cached agent responses and clear them for the selected clients")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    asyncio.run(run_kyc_workflow())
\ No newline at end of file
+    migrate(DB_PATH)
+    args = parse_args()
+    if args.no_cache:
+        for client_identifier in args.client_identifiers or [None]:
+            llm_cache.invalidate(client_identifier)
+    if args.query:
+        asyncio.run(run_kyc_batch(load_client_identifiers(args.query), args.concurrency))
+    elif args.all and args.changed_only:
+        # Triage the whole book first so unchanged clients cost no agent calls
+        summary = build_change_sets()
+        if summary.empty:
+            raise SystemExit("No extracted data matches any client's extracted_data document; "
+                             "cannot tell changed clients apart, run without --changed-only")
+        changed = summary.loc[summary["verdict"] != "no_change", "client_identifier"].tolist()
+        print(f"{len(changed)} of {len(summary)} clients have changes to review")
+        asyncio.run(run_kyc_batch(changed, args.concurrency))
+    elif args.all:
+        asyncio.run(run_kyc_batch(concurrency=args.concurrency))
+    elif args.client_identifiers:
+        asyncio.run(run_kyc_batch(args.client_identifiers, args.concurrency))
+    else:
+        asyncio.run(run_kyc_workflow())
\ No newline at end of file
@@ -0,0 +1,284 @@
+"""Deterministic column-level materiality check of extracted data against the onboarding record."""
+
+import json
+import os
+import sqlite3
+
+import pandas as pd
+
+from utils.config import DB_PATH
+
+RULES_TABLE = "MaterialityRule"
+
+# Columns that describe the record or its source rather than the client; never compared
+IGNORED_COLUMNS = {
+    'id', 'client_identifier', 'document_name', 'document_type',
+    'onboarding_created_date', 'onboarding_updated_date',
+    'KycRefresh_created_date', 'KycRefresh_updated_date',
+    'refresh_status', 'outreach_agent_status', 'screening_agent_status',
+    'research_agent_status', 'analyst_agent_status', 'material_change',
+    'material_changename', 'extracted_data',
+}
+
+# Seed for the MaterialityRule table: 1 = a change needs a KYC refresh, 0 = absorbed as a profile update
+DEFAULT_MATERIALITY_RULES = {
+    'entity_legal_name': 1,
+    'date_of_incorporation': 1,
+    'dba_name': 1,
+    'dba_address': 0,
+    'phone_number': 0,
+    'number_of_employees': 0,
+    'number_of_branches': 0,
+    'client_regulated': 1,
+    'name_of_regulator': 1,
+    'id_number': 1,
+    'country_issuing_id': 1,
+    'id_type': 1,
+    'date_of_id_issuance': 0,
+    'is_payment_intermediary': 1,
+    'member_type': 1,
+    'member_association': 0,
+    'member_role': 1,
+    'member_legal_name': 1,
+    'member_first_name': 1,
+    'member_middle_name': 1,
+    'member_last_name': 1,
+    'ownership_percentage': 1,
+    'identification_number': 1,
+    'issuing_country': 1,
+    'id_expiry_date': 0,
+    'identification_type': 0,
+    'address_line_1': 0,
+    'address_line_2': 0,
+    'address_country': 1,
+    'date_of_birth': 1,
+    'country_of_citizenship': 1,
+    'city_of_birth': 0,
+    'country_of_birth': 1,
+}
+
+# Per-member columns; a client has one row per member
+MEMBER_COLUMNS = {
+    'member_type', 'member_association', 'member_role', 'member_legal_name', 'member_first_name',
+    'member_middle_name', 'member_last_name', 'ownership_percentage', 'identification_number',
+    'issuing_country', 'id_expiry_date', 'identification_type', 'address_line_1', 'address_line_2',
+    'address_country', 'date_of_birth', 'country_of_citizenship', 'city_of_birth', 'country_of_birth',
+}
+# Columns identifying a member: the legal name of entities, the full name of individuals
+MEMBER_NAME_COLUMNS = ['member_legal_name', 'member_first_name', 'member_middle_name', 'member_last_name']
+
+# Verdicts that are certain enough to skip the Researcher agent
+DECISIVE_VERDICTS = ('no_change', 'non_material')
+
+# Rows of each client's latest refresh: its latest row (max id, as idx_refresh_client_latest indexes)
+# and the other member rows written with it
+LATEST_REFRESH_SQL = """
+    SELECT r.* FROM KycRefreshData r
+    WHERE r.KycRefresh_created_date IS (
+        SELECT KycRefresh_created_date FROM KycRefreshData
+        WHERE client_identifier = r.client_identifier
+        ORDER BY id DESC LIMIT 1
+    )
+"""
+
+
+def seed_materiality_rules(conn):
+    """Add the default rule of every column the rule table does not have yet, so it can be edited there."""
+    conn.executemany(
+        f"INSERT OR IGNORE INTO {RULES_TABLE} (column_name, is_material) VALUES (?, ?)",
+        DEFAULT_MATERIALITY_RULES.items(),
+    )
+
+
+def load_materiality_rules(conn):
+    """Return {column_name: is_material}: the rule table over the defaults. Read-only."""
+    rules = {column: bool(flag) for column, flag in DEFAULT_MATERIALITY_RULES.items()}
+    rules.update(
+        (column, bool(flag)) for column, flag in conn.execute(f"SELECT column_name, is_material FROM {RULES_TABLE}")
+    )
+    return rules
+
+
+def normalize_values(values):
+    """Normalize a Series to comparable keys: case-folded, punctuation and extra spaces removed."""
+    return (
+        values.fillna('').astype(str).str.casefold()
+        .str.replace(r'[^\w\s]', '', regex=True)
+        .str.split()
+        .str.join(' ')
+    )
+
+
+def normalize_frame(df):
+    """Normalize every column of a frame with `normalize_values`."""
+    return df.apply(normalize_values)
+
+
+def member_keys(df):
+    """Normalized key of the member each row describes; empty for rows without a member name."""
+    names = normalize_frame(df.reindex(columns=MEMBER_NAME_COLUMNS))
+    first, middle, last = (names[col] for col in MEMBER_NAME_COLUMNS[1:])
+    person = (first + ' ' + middle + ' ' + last).str.split().str.join(' ')
+    return names['member_legal_name'].where(names['member_legal_name'] != '', person)
+
+
+def labelled(pairs):
+    """Sorted 'member: value' labels of (member key, value) pairs, for display."""
+    return sorted(f"{key}: {value}" if key and key != value else value for key, value in pairs)
+
+
+def diff_columns(existing, extracted):
+    """Compare two frames column by column and return {column: {'old': [...], 'new': [...]}}.
+
+    A client has one row per member, so member columns are compared per member key (two members
+    swapping an attribute is a change) and client columns as the set of their values. Columns,
+    or member attributes, the extracted data leaves empty are treated as not provided rather than removed.
+    """
+    columns = [col for col in existing.columns if col in extracted.columns and col not in IGNORED_COLUMNS]
+    old = normalize_frame(existing[columns])
+    new = normalize_frame(extracted[columns])
+    old_members = member_keys(existing).tolist()
+    new_members = member_keys(extracted).tolist()
+    changes = {}
+    for col in columns:
+        if col in MEMBER_COLUMNS:
+            new_pairs = {(key, value) for key, value in zip(new_members, new[col]) if value}
+            provided = {key for key, _ in new_pairs}
+            # Member names also cover members missing from the extracted data
+            old_pairs = {
+                (key, value) for key, value in zip(old_members, old[col])
+                if value and (col in MEMBER_NAME_COLUMNS or key in provided)
+            }
+            if new_pairs and new_pairs != old_pairs:
+                changes[col] = {'old': labelled(old_pairs), 'new': labelled(new_pairs)}
+            continue
+        old_values = set(old[col]) - {''}
+        new_values = set(new[col]) - {''}
+        if new_values and new_values != old_values:
+            changes[col] = {'old': sorted(old_values), 'new': sorted(new_values)}
+    return changes
+
+
+def classify_changes(changes, rules):
+    """Split changed columns by materiality rule and derive the overall verdict."""
+    material = [col for col in changes if rules.get(col) is True]
+    non_material = [col for col in changes if rules.get(col) is False]
+    unclassified = [col for col in changes if col not in rules]
+    if unclassified:
+        verdict = 'undetermined'
+    elif material:
+        verdict = 'material'
+    elif non_material:
+        verdict = 'non_material'
+    else:
+        verdict = 'no_change'
+    return {
+        'verdict': verdict,
+        'material_changes': material,
+        'non_material_changes': non_material,
+        'unclassified_changes': unclassified,
+    }
+
+
+def load_current_profile(conn, client_identifier):
+    """Return the rows of the client's latest refresh if it was refreshed before, else its OnboardingData rows."""
+    params = (str(client_identifier),)
+    profile = pd.read_sql_query(f"{LATEST_REFRESH_SQL} AND r.client_identifier = ?", conn, params=params)
+    if profile.empty:
+        profile = pd.read_sql_query("SELECT * FROM OnboardingData WHERE client_identifier = ?", conn, params=params)
+    return profile
+
+
+def document_names(document):
+    """ExtractedData document_name values of a document file: its name with and without the extension."""
+    names = [str(document)]
+    stem = os.path.splitext(names[0])[0]
+    if stem and stem != names[0]:
+        names.append(stem)
+    return names
+
+
+def load_extracted_rows(conn, document):
+    """Return the ExtractedData rows of the document under review, or an empty frame for no document."""
+    names = document_names(document) if document else []
+    return pd.read_sql_query(
+        f"SELECT * FROM ExtractedData WHERE document_name IN ({', '.join('?' * len(names)) or 'NULL'})",
+        conn,
+        params=names,
+    )
+
+
+def assess_materiality(client_identifier, document, db_path=DB_PATH):
+    """Diff a client's current profile against the extracted rows of `document` and return the assessment.
+
+    `document` is the client's extracted data document (OnboardingData.extracted_data), whose rows
+    the extractor writes to ExtractedData under its document_name.
+    """
+    with sqlite3.connect(db_path) as conn:
+        rules = load_materiality_rules(conn)
+        existing = load_current_profile(conn, client_identifier)
+        extracted = load_extracted_rows(conn, document)
+
+    changes = diff_columns(existing, extracted) if not (existing.empty or extracted.empty) else {}
+    assessment = classify_changes(changes, rules)
+    if existing.empty or extracted.empty:
+        # Nothing to compare against; leave the decision to the Researcher agent
+        assessment['verdict'] = 'undetermined'
+    assessment['client_identifier'] = str(client_identifier)
+    assessment['document'] = document
+    assessment['changes'] = changes
+    assessment['existing_profile'] = existing.drop(columns=['id'], errors='ignore').to_dict(orient='records')
+    assessment['extracted_data'] = extracted.drop(columns=['id'], errors='ignore').to_dict(orient='records')
+    return assessment
+
+
+def is_decisive(assessment):
+    """True when the deterministic verdict is certain and the Researcher agent can be skipped."""
+    return assessment is not None and assessment['verdict'] in DECISIVE_VERDICTS
+
+
+def records_json(records):
+    return json.dumps(records, indent=2, default=str)
+
+
+class FastPathResult:
+    """Materiality verdict presented with the Runner result interface used by the later steps.
+
+    The conversation stands in for steps 1-3: the full existing profile, the full extracted
+    profile and the verdict, so the Analyst and Screening agents see every field and member name.
+    """
+
+    def __init__(self, assessment):
+        verdict = {
+            'client_identifier': assessment['client_identifier'],
+            'verdict': assessment['verdict'],
+            'No. of material changes': len(assessment['material_changes']),
+            'No. of non material changes': len(assessment['non_material_changes']),
+            'changes': assessment['changes'],
+        }
+        self.final_output = json.dumps(verdict, default=str)
+        self._input_list = [
+            {
+                "content": f"Read the existing KYC data of client_identifier {assessment['client_identifier']}.",
+                "role": "user",
+            },
+            {"content": records_json(assessment['existing_profile']), "role": "assistant"},
+            {
+                "content": f"Extract the KYC data of the new document {assessment['document']}.",
+                "role": "user",
+            },
+            {"content": records_json(assessment['extracted_data']), "role": "assistant"},
+            {
+                "content": "Compare the existing and newly extracted KYC data against the materiality rules.",
+                "role": "user",
+            },
+            {"content": self.final_output, "role": "assistant"},
+        ]
+        self.step_summaries = {
+            'existing_profile': assessment['existing_profile'],
+            'extracted_data': assessment['extracted_data'],
+            'materiality_verdict': verdict,
+        }
+
+    def to_input_list(self):
+        return list(self._input_list)
@@ -0,0 +1,110 @@
+"""Vectorized canonical keys of party and watchlist names, computed once and stored for screening.
+
+name_key: the name transliterated and folded to ASCII, lowercased, with dotted initials joined
+(p.l.c -> plc), other punctuation dropped, legal forms (SA, dd, AG, Ltd, ...) stripped and the
+distinct tokens sorted, so word order and spelling of the legal form do not matter.
+phonetic_key: the sorted distinct Soundex codes of the name_key tokens, used for blocking.
+"""
+
+import re
+
+import pandas as pd
+
+# Shorter tokens (initials) get no phonetic code
+MIN_PHONETIC_TOKEN_LEN = 2
+
+# Lowercase letters NFKD does not decompose into ASCII, and Cyrillic, transliterated before folding
+TRANSLITERATION = str.maketrans({
+    'ß': 'ss', 'æ': 'ae', 'œ': 'oe', 'ø': 'o', 'đ': 'd', 'ł': 'l', 'þ': 'th', 'ð': 'd', 'ı': 'i',
+    **dict(zip(
+        'абвгдеёжзийклмнопрстуфхцчшщъыьэюяіїєґ',
+        ['a', 'b', 'v', 'g', 'd', 'e', 'e', 'zh', 'z', 'i', 'y', 'k', 'l', 'm', 'n', 'o', 'p', 'r', 's',
+         't', 'u', 'f', 'kh', 'ts', 'ch', 'sh', 'shch', '', 'y', '', 'e', 'yu', 'ya', 'i', 'yi', 'ye', 'g'],
+    )),
+})
+
+# Legal forms removed wherever they appear ("Nova Ljubljanska banka dd Ljubljana")
+LEGAL_FORMS = [
+    'joint stock company', 'public joint stock company', 'public limited company', 'limited liability company',
+    'sa', 'sas', 'sarl', 'srl', 'spa', 'ag', 'gmbh', 'nv', 'bv', 'dd', 'doo', 'plc', 'ltd', 'llc', 'llp',
+    'inc', 'corp', 'jsc', 'pjsc', 'ojsc', 'cjsc', 'pte', 'pty', 'kk', 'oyj', 'asa', 'ooo', 'oao', 'zao', 'pao',
+]
+# Legal forms that are also ordinary words or names; removed only at the end of a name
+TRAILING_LEGAL_FORMS = [
+    'co', 'company', 'limited', 'corporation', 'incorporated', 'as', 'ab', 'se', 'sl', 'lp', 'kg', 'oy', 'ao',
+]
+
+LEGAL_FORMS_RE = r'\b(?:' + '|'.join(sorted(map(re.escape, LEGAL_FORMS), key=len, reverse=True)) + r')\b'
+TRAILING_LEGAL_FORMS_RE = r'(?:\s(?:' + '|'.join(map(re.escape, TRAILING_LEGAL_FORMS)) + r'))+$'
+
+SOUNDEX_DIGITS = {
+    letter: str(digit)
+    for digit, letters in enumerate(['aeiouy', 'bfpv', 'cgjkqsxz', 'dt', 'l', 'mn', 'r'])
+    for letter in letters
+}
+
+
+def fold_names(names):
+    """Lowercase ASCII names with punctuation dropped and whitespace collapsed; empty for missing names."""
+    text = names.fillna('').astype(str).str.lower()
+    # Only names with non-ASCII characters need transliteration and Unicode folding
+    non_ascii = text.str.contains(r'[^\x00-\x7f]', regex=True)
+    text[non_ascii] = (
+        text[non_ascii].str.translate(TRANSLITERATION)
+        .str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+    )
+    # Join dotted initials and elisions (p.l.c, o'brien) before other punctuation becomes a space
+    text = text.str.replace(r"(?<=[a-z0-9])[.'’](?=[a-z0-9])", '', regex=True)
+    return text.str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip()
+
+
+def strip_legal_forms(folded):
+    """Remove legal forms from folded names, keeping the name as is when nothing else would remain."""
+    stripped = folded.str.replace(LEGAL_FORMS_RE, ' ', regex=True).str.split().str.join(' ')
+    stripped = (' ' + stripped).str.replace(TRAILING_LEGAL_FORMS_RE, '', regex=True).str.strip()
+    return stripped.where(stripped != '', folded)
+
+
+def soundex(token):
+    """Four-character Soundex code of a folded token; tokens without letters are their own code."""
+    letters = [c for c in token if c.isalpha()]
+    if not letters:
+        return token
+    code, last = letters[0], SOUNDEX_DIGITS.get(letters[0], '')
+    for letter in letters[1:]:
+        if letter in 'hw':
+            continue
+        digit = SOUNDEX_DIGITS.get(letter, '')
+        if digit not in ('', '0') and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        last = digit
+    return code.ljust(4, '0')
+
+
+def phonetic_keys(name_keys):
+    """Sorted distinct Soundex codes of the tokens of each name_key; each distinct token is coded once."""
+    codes = {}
+
+    def phonetic_key(name_key):
+        tokens = [token for token in name_key.split() if len(token) >= MIN_PHONETIC_TOKEN_LEN]
+        for token in tokens:
+            if token not in codes:
+                codes[token] = soundex(token)
+        return ' '.join(sorted({codes[token] for token in tokens}))
+
+    return name_keys.map(phonetic_key)
+
+
+def name_keys(names):
+    """Frame of name_key and phonetic_key for a Series of raw names; each distinct name is keyed once."""
+    raw = names.fillna('').astype(str)
+    distinct = pd.Series(raw.unique())
+    normalized = strip_legal_forms(fold_names(distinct))
+    keys = pd.DataFrame({
+        'name_key': normalized.str.split().map(lambda tokens: ' '.join(sorted(set(tokens)))),
+    })
+    keys['phonetic_key'] = phonetic_keys(keys['name_key'])
+    keys.index = distinct
+    return keys.reindex(raw.values).set_axis(names.index)
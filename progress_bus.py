@@ -0,0 +1,74 @@
+"""In-process pub/sub of workflow progress, keyed by client_identifier.
+
+The workflow publishes run and step events; subscribers (the /client page) get them on their
+own event loop, so a page can update its elements directly as the run advances. Events of the
+current run are kept, so a page opened mid-run can show the steps that already happened.
+"""
+
+import asyncio
+import threading
+import time
+from collections import defaultdict
+
+# Characters of a step's output included in its step_end event
+PARTIAL_OUTPUT_CHARS = 500
+
+
+class ProgressBus:
+    """Topic -> subscriber callbacks, safe to publish to from any thread."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(list)
+        self._history = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic, callback):
+        """Call `callback(event)` on the current event loop for every event of `topic`.
+
+        Returns (events of the current run so far, a function that unsubscribes).
+        """
+        subscriber = (asyncio.get_running_loop(), callback)
+        with self._lock:
+            self._subscribers[topic].append(subscriber)
+            history = list(self._history[topic])
+
+        def unsubscribe():
+            with self._lock:
+                if subscriber in self._subscribers[topic]:
+                    self._subscribers[topic].remove(subscriber)
+
+        return history, unsubscribe
+
+    def publish(self, topic, event):
+        with self._lock:
+            if event['type'] == 'run_start':
+                self._history[topic] = []
+            self._history[topic].append(event)
+            subscribers = list(self._subscribers[topic])
+        for loop, callback in subscribers:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(callback, event)
+
+
+BUS = ProgressBus()
+
+
+def publish(client_identifier, event_type, **fields):
+    """Publish a workflow event for a client; `fields` are added to the event dict."""
+    BUS.publish(str(client_identifier), {
+        'type': event_type,
+        'client_identifier': str(client_identifier),
+        'time': time.time(),
+        **fields,
+    })
+
+
+def subscribe(client_identifier, callback):
+    """Subscribe to a client's workflow events; see ProgressBus.subscribe."""
+    return BUS.subscribe(str(client_identifier), callback)
+
+
+def partial_output(result):
+    """Leading part of a step result, for display while the run is in progress."""
+    output = str(getattr(result, "final_output", result))
+    return output if len(output) <= PARTIAL_OUTPUT_CHARS else output[:PARTIAL_OUTPUT_CHARS] + '...'
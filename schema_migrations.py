@@ -0,0 +1,543 @@
+"""Versioned schema migrations for the KYC SQLite database.
+
+The applied version is stored in `PRAGMA user_version`; each migration runs once, in its own
+immediate transaction that also reads the version, and `migrate()` is called at startup by the
+workflow and the GUIs.
+"""
+
+import sqlite3
+
+
+def add_column_if_missing(conn, table, column, definition):
+    """Add a column unless the table already has it (older databases were altered by hand)."""
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def add_client_lookup_indexes(conn):
+    """Index the client_identifier lookups of OnboardingData and KycRefreshData, including the latest-refresh-row query.
+
+    The ExtractedData client_identifier column and its index are never populated: extracted rows are
+    looked up by document_name (see add_extracted_document_index).
+    """
+    add_column_if_missing(conn, "ExtractedData", "client_identifier", "TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_onboarding_client ON OnboardingData (client_identifier)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_refresh_client_latest ON KycRefreshData (client_identifier, id DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_extracted_client ON ExtractedData (client_identifier)")
+
+
+def add_workflow_structures(conn):
+    """Add the columns and the agent log table that the workflow and the GUIs read and write."""
+    add_column_if_missing(conn, "KycRefreshData", "material_changename", "TEXT")
+    add_column_if_missing(conn, "OnboardingData", "extracted_data", "TEXT")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_identifier TEXT,
+            steps TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_log_client ON log (client_identifier)")
+
+
+def add_refresh_pipeline_tables(conn):
+    """Tables for materiality rules, workflow checkpoints and book-wide change sets."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS MaterialityRule (
+            column_name TEXT PRIMARY KEY,
+            is_material INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS WorkflowCheckpoint (
+            client_identifier TEXT NOT NULL,
+            step TEXT NOT NULL,
+            data_fingerprint TEXT,
+            final_output TEXT,
+            input_list TEXT,
+            update_data TEXT,
+            step_summaries TEXT,
+            completed_at REAL,
+            PRIMARY KEY (client_identifier, step)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ClientChangeSet (
+            client_identifier TEXT NOT NULL,
+            column_name TEXT NOT NULL,
+            old_value TEXT,
+            new_value TEXT,
+            is_material INTEGER,
+            computed_at REAL,
+            PRIMARY KEY (client_identifier, column_name)
+        )
+        """
+    )
+
+
+# Full-text search tables mirroring the dashboard's name and data source columns
+SEARCH_TABLES = {
+    "OnboardingSearch": "OnboardingData",
+    "KycRefreshSearch": "KycRefreshData",
+}
+SEARCH_COLUMNS = ["entity_legal_name", "dba_name", "member_legal_name", "document_name"]
+
+
+def add_search_indexes(conn):
+    """Create FTS5 indexes over client names and data sources, kept in sync by triggers."""
+    columns = ", ".join(SEARCH_COLUMNS)
+    new_values = ", ".join(f"new.{col}" for col in SEARCH_COLUMNS)
+    old_values = ", ".join(f"old.{col}" for col in SEARCH_COLUMNS)
+    for search_table, table in SEARCH_TABLES.items():
+        conn.execute(
+            f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {search_table} USING fts5(
+                {columns},
+                content='{table}',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {search_table}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {search_table} (rowid, {columns}) VALUES (new.id, {new_values});
+            END
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {search_table}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {search_table} ({search_table}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            END
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {search_table}_update AFTER UPDATE OF {columns} ON {table} BEGIN
+                INSERT INTO {search_table} ({search_table}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {search_table} (rowid, {columns}) VALUES (new.id, {new_values});
+            END
+            """
+        )
+        conn.execute(f"INSERT INTO {search_table} ({search_table}) VALUES ('rebuild')")
+
+
+def add_dashboard_change_log(conn):
+    """Record the client_identifier of every KycRefreshData change for the dashboard cache."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS DashboardChangeLog (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_identifier TEXT
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS KycRefreshData_log_insert AFTER INSERT ON KycRefreshData BEGIN
+            INSERT INTO DashboardChangeLog (client_identifier) VALUES (new.client_identifier);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS KycRefreshData_log_update AFTER UPDATE ON KycRefreshData BEGIN
+            INSERT INTO DashboardChangeLog (client_identifier) VALUES (new.client_identifier);
+            INSERT INTO DashboardChangeLog (client_identifier)
+                SELECT old.client_identifier WHERE old.client_identifier IS NOT new.client_identifier;
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS KycRefreshData_log_delete AFTER DELETE ON KycRefreshData BEGIN
+            INSERT INTO DashboardChangeLog (client_identifier) VALUES (old.client_identifier);
+        END
+        """
+    )
+
+
+def log_workflow_completion_changes(conn):
+    """Record agent log inserts (written when a workflow completes) in DashboardChangeLog too."""
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS log_change_insert AFTER INSERT ON log BEGIN
+            INSERT INTO DashboardChangeLog (client_identifier) VALUES (new.client_identifier);
+        END
+        """
+    )
+
+
+# Normalized rows of agent log entries: one row per element of the `steps` JSON array of log row
+# `{row}` (read from `{source}`), with the agent recovered from step names like "Scan Profiles (Screening Agent)"
+AGENT_STEP_ROWS = """
+    SELECT
+        s.client_identifier,
+        s.run_id,
+        CASE WHEN instr(s.name, ' (') > 0 AND s.name LIKE '%)' THEN substr(s.name, 1, instr(s.name, ' (') - 1) ELSE s.name END,
+        CASE WHEN instr(s.name, ' (') > 0 AND s.name LIKE '%)'
+             THEN substr(s.name, instr(s.name, ' (') + 2, length(s.name) - instr(s.name, ' (') - 2) END,
+        s.start,
+        s.duration_sec,
+        s.score,
+        s.status,
+        s.result
+    FROM (
+        SELECT
+            {row}.client_identifier AS client_identifier,
+            {row}.id AS run_id,
+            json_extract(value, '$.step') AS name,
+            coalesce(json_extract(value, '$.start'), json_extract(value, '$.start_time')) AS start,
+            json_extract(value, '$.duration_sec') AS duration_sec,
+            json_extract(value, '$.score') AS score,
+            json_extract(value, '$.status') AS status,
+            json_extract(value, '$.result') AS result
+        FROM {source}json_each(CASE WHEN json_valid({row}.steps) AND json_type({row}.steps) = 'array' THEN {row}.steps ELSE '[]' END)
+        WHERE json_type(value) = 'object'
+    ) s
+"""
+
+
+def add_agent_step_log(conn):
+    """Normalize every agent log entry into AgentStepLog rows, on insert and for existing history."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS AgentStepLog (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_identifier TEXT,
+            run_id INTEGER,
+            step TEXT,
+            agent TEXT,
+            start TEXT,
+            duration_sec REAL,
+            score REAL,
+            status TEXT,
+            result TEXT
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_step_log_client_agent ON AgentStepLog (client_identifier, agent)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_step_log_client_step ON AgentStepLog (client_identifier, step)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_step_log_agent ON AgentStepLog (agent, duration_sec)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_step_log_run ON AgentStepLog (run_id)")
+    columns = "client_identifier, run_id, step, agent, start, duration_sec, score, status, result"
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS log_step_rows_insert AFTER INSERT ON log BEGIN
+            INSERT INTO AgentStepLog ({columns}) {AGENT_STEP_ROWS.format(row='new', source='')};
+        END
+        """
+    )
+    conn.execute(f"INSERT INTO AgentStepLog ({columns}) {AGENT_STEP_ROWS.format(row='l', source='log l, ')} ORDER BY s.run_id")
+
+
+# Upper bounds (seconds) of the step latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKET_BOUNDS = [0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600]
+# Scores are bucketed into tenths of the 0-1 range: bucket 10 holds perfect scores
+SCORE_BUCKETS = 10
+
+
+def latency_bucket_sql(column):
+    """SQL expression giving the latency histogram bucket of `column`."""
+    cases = " ".join(f"WHEN {column} <= {bound} THEN {i}" for i, bound in enumerate(LATENCY_BUCKET_BOUNDS))
+    return f"CASE WHEN {column} IS NULL THEN NULL {cases} ELSE {len(LATENCY_BUCKET_BOUNDS)} END"
+
+
+def score_bucket_sql(column):
+    """SQL expression giving the score histogram bucket of `column`."""
+    return f"CASE WHEN {column} IS NULL THEN NULL ELSE CAST(MIN(MAX({column}, 0), 1) * {SCORE_BUCKETS} AS INTEGER) END"
+
+
+def rollup_step_values(row):
+    """SQL expressions of the rollup contributions of AgentStepLog row `row`."""
+    return {
+        # ISO start times, then epoch seconds; anything else counts for today rather than failing the insert
+        "day": f"coalesce(date({row}.start), date({row}.start, 'unixepoch'), date('now'))",
+        "failed": f"CASE WHEN lower({row}.status) IN ('failed', 'error') THEN 1 ELSE 0 END",
+        "time": f"coalesce({row}.duration_sec, 0)",
+        "score": f"coalesce({row}.score, 0)",
+        "scored": f"CASE WHEN {row}.score IS NULL THEN 0 ELSE 1 END",
+        "latency_bucket": latency_bucket_sql(f"{row}.duration_sec"),
+        "score_bucket": score_bucket_sql(f"{row}.score"),
+    }
+
+
+def create_agent_rollup_trigger(conn):
+    """Trigger adding each new AgentStepLog row to the rollup tables of add_agent_rollups.
+
+    Steps restored from a workflow checkpoint ran (and were counted) in an earlier run, so they are skipped.
+    """
+    add_totals = """
+                jobs = jobs + excluded.jobs,
+                failures = failures + excluded.failures,
+                total_time = total_time + excluded.total_time,
+                score_sum = score_sum + excluded.score_sum,
+                score_count = score_count + excluded.score_count"""
+    v = rollup_step_values("new")
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS AgentStepLog_rollup_insert AFTER INSERT ON AgentStepLog
+        WHEN new.agent IS NOT NULL AND new.status IS NOT 'restored' BEGIN
+            INSERT INTO AgentRollupDaily VALUES ({v['day']}, new.agent, 1, {v['failed']}, {v['time']}, {v['score']}, {v['scored']})
+                ON CONFLICT (day, agent) DO UPDATE SET {add_totals};
+            INSERT INTO AgentRollupClient VALUES (new.client_identifier, new.agent, 1, {v['failed']}, {v['time']}, {v['score']}, {v['scored']})
+                ON CONFLICT (client_identifier, agent) DO UPDATE SET {add_totals};
+            INSERT INTO AgentLatencyHistogram SELECT {v['day']}, new.agent, {v['latency_bucket']}, 1
+                WHERE new.duration_sec IS NOT NULL
+                ON CONFLICT (day, agent, bucket) DO UPDATE SET steps = steps + 1;
+            INSERT INTO AgentScoreHistogram SELECT {v['day']}, new.agent, {v['score_bucket']}, 1
+                WHERE new.score IS NOT NULL
+                ON CONFLICT (day, agent, bucket) DO UPDATE SET steps = steps + 1;
+        END
+        """
+    )
+
+
+def add_agent_rollups(conn):
+    """Per agent/day and per client/agent rollups of AgentStepLog, maintained by an insert trigger."""
+    totals = """
+            jobs INTEGER NOT NULL DEFAULT 0,
+            failures INTEGER NOT NULL DEFAULT 0,
+            total_time REAL NOT NULL DEFAULT 0,
+            score_sum REAL NOT NULL DEFAULT 0,
+            score_count INTEGER NOT NULL DEFAULT 0"""
+    conn.execute(f"CREATE TABLE IF NOT EXISTS AgentRollupDaily (day TEXT NOT NULL, agent TEXT NOT NULL,{totals}, PRIMARY KEY (day, agent))")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS AgentRollupClient (client_identifier TEXT NOT NULL, agent TEXT NOT NULL,{totals}, PRIMARY KEY (client_identifier, agent))")
+    for table in ("AgentLatencyHistogram", "AgentScoreHistogram"):
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                day TEXT NOT NULL,
+                agent TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                steps INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, agent, bucket)
+            )
+            """
+        )
+    create_agent_rollup_trigger(conn)
+
+    # Backfill from the step history already in AgentStepLog
+    v = rollup_step_values("l")
+    sums = f"COUNT(*), SUM({v['failed']}), SUM({v['time']}), SUM({v['score']}), SUM({v['scored']})"
+    conn.execute(f"INSERT INTO AgentRollupDaily SELECT {v['day']}, agent, {sums} FROM AgentStepLog l WHERE agent IS NOT NULL GROUP BY 1, 2")
+    conn.execute(f"INSERT INTO AgentRollupClient SELECT client_identifier, agent, {sums} FROM AgentStepLog l WHERE agent IS NOT NULL AND client_identifier IS NOT NULL GROUP BY 1, 2")
+    conn.execute(f"INSERT INTO AgentLatencyHistogram SELECT {v['day']}, agent, {v['latency_bucket']}, COUNT(*) FROM AgentStepLog l WHERE agent IS NOT NULL AND duration_sec IS NOT NULL GROUP BY 1, 2, 3")
+    conn.execute(f"INSERT INTO AgentScoreHistogram SELECT {v['day']}, agent, {v['score_bucket']}, COUNT(*) FROM AgentStepLog l WHERE agent IS NOT NULL AND score IS NOT NULL GROUP BY 1, 2, 3")
+
+
+def add_refresh_job_queue(conn):
+    """Persistent queue of KYC refresh runs requested from the GUI, worked by job_queue.JobWorkerPool."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS RefreshJob (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_identifier TEXT NOT NULL,
+            sla_date TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            not_before REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at REAL,
+            updated_at REAL
+        )
+        """
+    )
+    # Next job to claim: earliest SLA date first
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_refresh_job_next ON RefreshJob (status, sla_date, id)")
+    # At most one queued or running job per client
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_refresh_job_active ON RefreshJob (client_identifier) "
+        "WHERE status IN ('queued', 'running')"
+    )
+
+
+def add_screening_tables(conn):
+    """Add the sanctions/PEP watchlist screened by screening_engine and the matches it records."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ScreeningWatchlist (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            list_name TEXT,
+            category TEXT,
+            name TEXT NOT NULL,
+            details TEXT,
+            updated_at REAL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ScreeningMatch (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_identifier TEXT NOT NULL,
+            party_role TEXT,
+            party_name TEXT,
+            watchlist_id INTEGER,
+            watchlist_name TEXT,
+            list_name TEXT,
+            category TEXT,
+            score REAL,
+            screened_at REAL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_screening_match_client ON ScreeningMatch (client_identifier)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_screening_match_entry ON ScreeningMatch (watchlist_id)")
+
+
+def add_screening_name_keys(conn):
+    """Store the canonical name keys of watchlist entries and parties (see name_normalization)."""
+    add_column_if_missing(conn, "ScreeningWatchlist", "name_key", "TEXT")
+    add_column_if_missing(conn, "ScreeningWatchlist", "phonetic_key", "TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_screening_watchlist_key ON ScreeningWatchlist (name_key)")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ScreeningParty (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_identifier TEXT NOT NULL,
+            party_role TEXT,
+            party_name TEXT,
+            name_key TEXT,
+            phonetic_key TEXT
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_screening_party_client ON ScreeningParty (client_identifier)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_screening_party_key ON ScreeningParty (name_key)")
+    # Version of the source tables ScreeningParty was last rebuilt from
+    conn.execute("CREATE TABLE IF NOT EXISTS ScreeningKeyVersion (name TEXT PRIMARY KEY, version TEXT)")
+
+
+def fix_agent_rollup_day(conn):
+    """Recreate the rollup trigger so a start time that is not an ISO date no longer aborts the log insert."""
+    conn.execute("DROP TRIGGER IF EXISTS AgentStepLog_rollup_insert")
+    create_agent_rollup_trigger(conn)
+
+
+def add_watchlist_version(conn):
+    """Counter bumped by triggers on every watchlist change, so screening checks for staleness in O(1)."""
+    conn.execute("CREATE TABLE IF NOT EXISTS ScreeningVersion (name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)")
+    conn.execute("INSERT OR IGNORE INTO ScreeningVersion (name, version) VALUES ('watchlist', 0)")
+    bump = "UPDATE ScreeningVersion SET version = version + 1 WHERE name = 'watchlist';"
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS ScreeningWatchlist_version_insert AFTER INSERT ON ScreeningWatchlist BEGIN {bump} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS ScreeningWatchlist_version_delete AFTER DELETE ON ScreeningWatchlist BEGIN {bump} END")
+    # Storing computed name keys does not change what the index holds
+    conn.execute(
+        "CREATE TRIGGER IF NOT EXISTS ScreeningWatchlist_version_update "
+        f"AFTER UPDATE OF list_name, category, name ON ScreeningWatchlist BEGIN {bump} END"
+    )
+
+
+# Profile columns screening_engine builds party names from
+PARTY_SOURCE_COLUMNS = [
+    "client_identifier", "entity_legal_name", "member_legal_name",
+    "member_first_name", "member_middle_name", "member_last_name",
+]
+
+
+def add_party_change_log(conn):
+    """Log the client_identifier of every profile change that can alter the screened party names."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ScreeningPartyChange (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_identifier TEXT
+        )
+        """
+    )
+    log_new = "INSERT INTO ScreeningPartyChange (client_identifier) VALUES (new.client_identifier);"
+    log_old = "INSERT INTO ScreeningPartyChange (client_identifier) VALUES (old.client_identifier);"
+    for table in ("KycRefreshData", "OnboardingData"):
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_party_insert AFTER INSERT ON {table} BEGIN {log_new} END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_party_delete AFTER DELETE ON {table} BEGIN {log_old} END")
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_party_update AFTER UPDATE OF {", ".join(PARTY_SOURCE_COLUMNS)} ON {table} BEGIN
+                {log_new}
+                INSERT INTO ScreeningPartyChange (client_identifier)
+                    SELECT old.client_identifier WHERE old.client_identifier IS NOT new.client_identifier;
+            END
+            """
+        )
+    # Party keys built from the old whole-table version probe are rebuilt once against the log
+    conn.execute("DELETE FROM ScreeningKeyVersion WHERE name = 'parties'")
+
+
+def skip_restored_steps_in_rollups(conn):
+    """Recreate the rollup trigger so steps restored from a checkpoint are not counted again."""
+    conn.execute("DROP TRIGGER IF EXISTS AgentStepLog_rollup_insert")
+    create_agent_rollup_trigger(conn)
+
+
+def add_extracted_document_index(conn):
+    """Index the document_name lookup of the extracted rows of a client's document."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_extracted_document ON ExtractedData (document_name)")
+
+
+# Append new migrations at the end; never reorder or edit one that has shipped
+MIGRATIONS = [
+    add_client_lookup_indexes,
+    add_workflow_structures,
+    add_refresh_pipeline_tables,
+    add_search_indexes,
+    add_dashboard_change_log,
+    log_workflow_completion_changes,
+    add_agent_step_log,
+    add_agent_rollups,
+    add_refresh_job_queue,
+    add_screening_tables,
+    add_screening_name_keys,
+    fix_agent_rollup_day,
+    add_watchlist_version,
+    add_party_change_log,
+    skip_restored_steps_in_rollups,
+    add_extracted_document_index,
+]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db_path):
+    """Apply all pending migrations to the database and return the resulting schema version."""
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    try:
+        while True:
+            # Take the write lock before reading the version, so a GUI and a workflow starting
+            # together cannot both apply the same step; the loser sees the new version
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = schema_version(conn)
+                if version >= len(MIGRATIONS):
+                    conn.execute("COMMIT")
+                    return version
+                migration = MIGRATIONS[version]
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {version + 1}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            print(f"Applied schema migration {version + 1}: {migration.__name__}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(f"Schema version: {migrate(sys.argv[1] if len(sys.argv) > 1 else 'Data/KYC_DataBase.db')}")
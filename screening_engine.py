@@ -0,0 +1,569 @@
+"""Local sanctions/PEP screening of client and member names against the ScreeningWatchlist table.
+
+Names are compared by the canonical keys of name_normalization, computed in batch and stored
+with the watchlist entries and, per party, in ScreeningParty, so screening runs do not redo the
+normalization from the raw strings. The watchlist is loaded once into a NameIndex that blocks
+entries by their phonetic codes, singly and in pairs. A name is only compared with the entries
+sharing a pair of its codes (or, for one-word names, a code), so the work per name does not grow
+with the size of the list, and candidates are scored with token-set similarity of their name keys.
+Matches are stored in ScreeningMatch.
+
+When the watchlist changes, `apply_watchlist_delta` goes the other way: the added entries are
+looked up in a NameIndex over all parties of the book, so only the affected names are scored.
+Profile changes reach that index through the ScreeningPartyChange log: only the clients logged
+since the last sync are re-keyed and replaced in the index.
+"""
+
+import argparse
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from difflib import SequenceMatcher
+from itertools import combinations
+
+import pandas as pd
+
+from utils.config import DB_PATH
+import db_writer
+from materiality import LATEST_REFRESH_SQL
+from name_normalization import name_keys
+from schema_migrations import migrate
+
+WATCHLIST_TABLE = "ScreeningWatchlist"
+MATCH_TABLE = "ScreeningMatch"
+PARTY_TABLE = "ScreeningParty"
+PARTY_CHANGE_TABLE = "ScreeningPartyChange"
+KEY_VERSION_TABLE = "ScreeningKeyVersion"
+VERSION_TABLE = "ScreeningVersion"
+# Token-set similarity (0-1) at or above which a watchlist entry is reported as a match
+MATCH_THRESHOLD = 0.88
+# Blocks with more entries than this are skipped unless a name has no smaller block
+MAX_BLOCK_SIZE = 5000
+# A NameIndex is rebuilt once more than this share of its entries were replaced
+MAX_REPLACED_SHARE = 0.5
+# Party change log entries older than this many changes are pruned once ScreeningParty is synced past them
+PARTY_CHANGE_MAX_ROWS = 10000
+
+# Party name columns of a profile row: (party_role, column)
+PARTY_NAME_COLUMNS = [('client', 'entity_legal_name'), ('member', 'member_legal_name')]
+MEMBER_NAME_PARTS = ['member_first_name', 'member_middle_name', 'member_last_name']
+
+# Latest profile change that can alter party names (see schema_migrations.add_party_change_log)
+PARTY_CHANGE_SEQ_SQL = f"SELECT coalesce(MAX(seq), 0) FROM {PARTY_CHANGE_TABLE}"
+
+MATCH_COLUMNS = [
+    'client_identifier', 'party_role', 'party_name',
+    'watchlist_id', 'watchlist_name', 'list_name', 'category', 'score',
+]
+
+
+def insert_rows(conn, table, df):
+    """Insert the rows of a frame. Unlike DataFrame.to_sql it does not commit, so it can run in a db_writer transaction."""
+    columns = list(df.columns)
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        df.astype(object).where(df.notna(), None).itertuples(index=False, name=None),
+    )
+
+
+def blocking_keys(codes):
+    """Block keys of a name: each code, and each pair of codes in sorted order."""
+    return list(codes) + list(combinations(sorted(codes), 2))
+
+
+def _ratio(a, b, floor):
+    """SequenceMatcher ratio of two strings, or 0 as soon as its cheap upper bounds fall below `floor`."""
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    if matcher.real_quick_ratio() < floor or matcher.quick_ratio() < floor:
+        return 0.0
+    return matcher.ratio()
+
+
+def token_set_similarity(tokens_a, tokens_b, floor=0.0):
+    """Similarity (0-1) of two names as token sets, so word order and repeated words do not matter.
+
+    As in the usual token-set ratio, the shared tokens are also compared with each full name,
+    but only when at least two tokens are shared: one common first name is not a match.
+    """
+    a, b = set(tokens_a), set(tokens_b)
+    if not a or not b:
+        return 0.0
+    common = ' '.join(sorted(a & b))
+    full_a = ' '.join(filter(None, [common, ' '.join(sorted(a - b))]))
+    full_b = ' '.join(filter(None, [common, ' '.join(sorted(b - a))]))
+    pairs = [(full_a, full_b)]
+    if len(a & b) >= 2:
+        pairs += [(common, full_a), (common, full_b)]
+    return max(_ratio(x, y, floor) for x, y in pairs)
+
+
+class NameIndex:
+    """Rows of a frame with name_key and phonetic_key columns, blocked by their phonetic codes."""
+
+    def __init__(self, entries):
+        self.entries = entries.reset_index(drop=True)
+        self.tokens = []
+        self.blocks = defaultdict(list)
+        # Positions of entries dropped by replace(); skipped as candidates
+        self.removed = set()
+        self.add_blocks(self.entries)
+
+    def add_blocks(self, entries):
+        """Tokenize and block entries that were appended at the end of self.entries."""
+        start = len(self.tokens)
+        for offset, (name_key, phonetic_key) in enumerate(zip(entries['name_key'], entries['phonetic_key'])):
+            self.tokens.append(name_key.split())
+            for key in blocking_keys(set(phonetic_key.split())):
+                self.blocks[key].append(start + offset)
+
+    def replace(self, column, values, entries):
+        """Drop the entries whose `column` is in `values` and add `entries`; other positions are unchanged."""
+        self.removed.update(self.entries.index[self.entries[column].isin(values)].difference(list(self.removed)))
+        entries = entries.reset_index(drop=True)
+        self.entries = pd.concat([self.entries, entries], ignore_index=True)
+        self.add_blocks(entries)
+
+    def candidates(self, phonetic_key):
+        """Positions of the entries sharing a pair of codes with a name (one code for one-word names).
+
+        Oversized blocks are skipped unless the name has no smaller one.
+        """
+        codes = set(phonetic_key.split())
+        keys = list(combinations(sorted(codes), 2)) or list(codes)
+        blocks = [self.blocks[key] for key in keys if key in self.blocks]
+        if not blocks:
+            # No entry shares two codes; fall back to the single codes
+            blocks = [self.blocks[code] for code in codes if code in self.blocks]
+        if not blocks:
+            return set()
+        selective = [block for block in blocks if len(block) <= MAX_BLOCK_SIZE]
+        candidates = set()
+        for block in selective or [min(blocks, key=len)]:
+            candidates.update(block)
+        return candidates - self.removed
+
+    def match(self, name_key, phonetic_key, threshold=MATCH_THRESHOLD):
+        """(entry position, score) of the entries matching a name at or above `threshold`, best first."""
+        tokens = name_key.split()
+        scored = []
+        for position in self.candidates(phonetic_key):
+            score = token_set_similarity(tokens, self.tokens[position], threshold)
+            if score >= threshold:
+                scored.append((position, round(score, 3)))
+        return sorted(scored, key=lambda item: -item[1])
+
+    def screen(self, parties, threshold=MATCH_THRESHOLD):
+        """Match a frame of parties with their name keys; each distinct name_key is scored once."""
+        keys = parties.loc[parties['name_key'] != '', ['name_key', 'phonetic_key']].drop_duplicates('name_key')
+        hits = []
+        for name_key, phonetic_key in keys.itertuples(index=False):
+            for position, score in self.match(name_key, phonetic_key, threshold):
+                hits.append((name_key, position, score))
+        if not hits:
+            return pd.DataFrame(columns=MATCH_COLUMNS)
+
+        hits = pd.DataFrame(hits, columns=['name_key', 'position', 'score'])
+        entries = self.entries.rename(columns={'id': 'watchlist_id', 'name': 'watchlist_name'})
+        hits = hits.join(entries[['watchlist_id', 'watchlist_name', 'list_name', 'category']], on='position')
+        matches = parties.merge(hits, on='name_key')
+        return matches.sort_values(['client_identifier', 'score'], ascending=[True, False])[MATCH_COLUMNS]
+
+
+def load_parties(conn, client_identifiers=None):
+    """Client and member names of the current profiles, as (client_identifier, party_role, party_name) rows.
+
+    As in change_sets, a client's current profile is the rows of its latest refresh when it has
+    been refreshed before, otherwise its OnboardingData rows. Members are screened by legal name and
+    by the name composed of their first, middle and last names.
+    """
+    where, params = "", ()
+    if client_identifiers is not None:
+        where = "WHERE client_identifier IN (SELECT value FROM json_each(?))"
+        params = (json.dumps([str(client_identifier) for client_identifier in client_identifiers]),)
+    columns = ', '.join(['client_identifier'] + [column for _, column in PARTY_NAME_COLUMNS] + MEMBER_NAME_PARTS)
+    refresh = pd.read_sql_query(f"SELECT {columns} FROM ({LATEST_REFRESH_SQL}) {where}", conn, params=params)
+    onboarding = pd.read_sql_query(f"SELECT {columns} FROM OnboardingData {where}", conn, params=params)
+    onboarding = onboarding[~onboarding['client_identifier'].isin(refresh['client_identifier'])]
+    profiles = pd.concat([refresh, onboarding], ignore_index=True)
+    profiles['client_identifier'] = profiles['client_identifier'].astype(str)
+
+    composed = profiles[MEMBER_NAME_PARTS].fillna('').astype(str).agg(' '.join, axis=1)
+    names = [(role, profiles[column]) for role, column in PARTY_NAME_COLUMNS] + [('member', composed)]
+    parties = pd.concat(
+        [
+            pd.DataFrame({'client_identifier': profiles['client_identifier'], 'party_role': role, 'party_name': name})
+            for role, name in names
+        ],
+        ignore_index=True,
+    )
+    parties = parties.dropna(subset=['party_name'])
+    parties['party_name'] = parties['party_name'].astype(str).str.split().str.join(' ')
+    return parties[parties['party_name'] != ''].drop_duplicates().reset_index(drop=True)
+
+
+def keyed_parties(conn, client_identifiers=None):
+    """Parties of the clients (default: the whole book) with their name keys, as stored in ScreeningParty."""
+    parties = load_parties(conn, client_identifiers)
+    parties = parties.join(name_keys(parties['party_name']))
+    return parties[parties['name_key'] != ''].drop_duplicates(['client_identifier', 'party_role', 'name_key'])
+
+
+def store_party_keys(conn, client_identifiers=None, parties=None):
+    """Store the keyed parties of the clients (default: the whole book) in ScreeningParty.
+
+    `parties` are computed with keyed_parties when not given.
+    """
+    if parties is None:
+        parties = keyed_parties(conn, client_identifiers)
+    if client_identifiers is None:
+        conn.execute(f"DELETE FROM {PARTY_TABLE}")
+    else:
+        conn.executemany(
+            f"DELETE FROM {PARTY_TABLE} WHERE client_identifier = ?",
+            [(str(client_identifier),) for client_identifier in client_identifiers],
+        )
+    insert_rows(conn, PARTY_TABLE, parties)
+
+
+def changed_clients(conn, after_seq, until_seq):
+    """Clients with a logged profile change in (after_seq, until_seq].
+
+    None when entries after `after_seq` were already pruned, in which case callers must rebuild everything.
+    """
+    first_seq = conn.execute(f"SELECT MIN(seq) FROM {PARTY_CHANGE_TABLE}").fetchone()[0]
+    if first_seq is not None and first_seq > after_seq + 1:
+        return None
+    return [
+        row[0] for row in conn.execute(
+            f"SELECT DISTINCT client_identifier FROM {PARTY_CHANGE_TABLE} "
+            "WHERE seq > ? AND seq <= ? AND client_identifier IS NOT NULL",
+            (after_seq, until_seq),
+        )
+    ]
+
+
+def sync_party_keys(conn):
+    """Re-key the parties of the clients changed since ScreeningParty was last synced; return the change seq.
+
+    ScreeningParty is built for the whole book only the first time, or when the changes since the
+    last sync were pruned. Once synced, log entries more than PARTY_CHANGE_MAX_ROWS changes old are pruned.
+    """
+    seq = conn.execute(PARTY_CHANGE_SEQ_SQL).fetchone()[0]
+    stored = conn.execute(f"SELECT version FROM {KEY_VERSION_TABLE} WHERE name = 'party_change_seq'").fetchone()
+    if stored is not None and int(stored[0]) >= seq:
+        return seq
+    store_party_keys(conn, changed_clients(conn, int(stored[0]), seq) if stored is not None else None)
+    conn.execute(
+        f"INSERT INTO {KEY_VERSION_TABLE} (name, version) VALUES ('party_change_seq', ?) "
+        "ON CONFLICT (name) DO UPDATE SET version = excluded.version",
+        (str(seq),),
+    )
+    # Newer entries are kept so in-process indexes a little behind can still patch themselves
+    conn.execute(f"DELETE FROM {PARTY_CHANGE_TABLE} WHERE seq <= ?", (seq - PARTY_CHANGE_MAX_ROWS,))
+    conn.commit()
+    return seq
+
+
+def load_party_keys(conn, client_identifiers=None):
+    """Stored parties with their name keys, of the given clients or the whole book."""
+    query = f"SELECT client_identifier, party_role, party_name, name_key, phonetic_key FROM {PARTY_TABLE}"
+    params = ()
+    if client_identifiers is not None:
+        query += " WHERE client_identifier IN (SELECT value FROM json_each(?))"
+        params = (json.dumps([str(client_identifier) for client_identifier in client_identifiers]),)
+    return pd.read_sql_query(query, conn, params=params).fillna({'name_key': '', 'phonetic_key': ''})
+
+
+def store_watchlist_keys(conn):
+    """Compute and store the keys of watchlist entries inserted without them; returns the number keyed."""
+    missing = pd.read_sql_query(f"SELECT id, name FROM {WATCHLIST_TABLE} WHERE name_key IS NULL", conn)
+    if not missing.empty:
+        keys = name_keys(missing['name'])
+        conn.executemany(
+            f"UPDATE {WATCHLIST_TABLE} SET name_key = ?, phonetic_key = ? WHERE id = ?",
+            zip(keys['name_key'], keys['phonetic_key'], missing['id'].tolist()),
+        )
+        conn.commit()
+    return len(missing)
+
+
+def load_watchlist_entries(conn):
+    """Watchlist entries with their name keys; keys missing from the table are computed in memory only."""
+    entries = pd.read_sql_query(
+        f"SELECT id, name, list_name, category, name_key, phonetic_key FROM {WATCHLIST_TABLE}", conn
+    )
+    missing = entries['name_key'].isna()
+    if missing.any():
+        entries.loc[missing, ['name_key', 'phonetic_key']] = name_keys(entries.loc[missing, 'name']).values
+    return entries.fillna({'name_key': '', 'phonetic_key': ''})
+
+
+class IndexCache:
+    """A NameIndex kept in memory and rebuilt only when the result of `version_sql` changes."""
+
+    def __init__(self, version_sql, load_entries):
+        self.version_sql = version_sql
+        self.load_entries = load_entries
+        self.index = None
+        self.version = None
+        self.lock = threading.Lock()
+
+    def get(self, conn):
+        """The current NameIndex, or None when there are no entries."""
+        version = conn.execute(self.version_sql).fetchone()
+        with self.lock:
+            if version != self.version:
+                self.refresh(conn, version)
+                self.version = version
+            return self.index
+
+    def refresh(self, conn, version):
+        entries = self.load_entries(conn)
+        self.index = NameIndex(entries) if not entries.empty else None
+
+
+class PartyIndexCache(IndexCache):
+    """NameIndex over the parties of the book, patched with the clients in the party change log."""
+
+    def __init__(self):
+        super().__init__(PARTY_CHANGE_SEQ_SQL, load_party_keys)
+
+    def refresh(self, conn, version):
+        seq = version[0]
+        sync_party_keys(conn)
+        if self.index is None or self.version is None:
+            return super().refresh(conn, version)
+        clients = changed_clients(conn, self.version[0], seq)
+        if clients is None:
+            return super().refresh(conn, version)
+        self.index.replace('client_identifier', clients, load_party_keys(conn, clients))
+        if len(self.index.removed) > MAX_REPLACED_SHARE * len(self.index.entries):
+            super().refresh(conn, version)
+
+
+# Bumped by triggers on every watchlist change (see schema_migrations.add_watchlist_version)
+WATCHLIST_INDEX = IndexCache(
+    f"SELECT version FROM {VERSION_TABLE} WHERE name = 'watchlist'", load_watchlist_entries
+)
+# Inverted index over the names of every client and member of the book
+PARTY_INDEX = PartyIndexCache()
+
+
+def update_screening_status(conn, client_identifiers):
+    """Set screening_agent_status of the clients' refresh rows to 1 if they have a stored match, else 0.
+
+    Only rows whose status changes are written; returns the number of rows updated.
+    """
+    client_identifiers = [str(client_identifier) for client_identifier in client_identifiers]
+    hits = {
+        row[0] for row in conn.execute(
+            f"SELECT DISTINCT client_identifier FROM {MATCH_TABLE} WHERE client_identifier IN (SELECT value FROM json_each(?))",
+            (json.dumps(client_identifiers),),
+        )
+    }
+    statuses = [(int(client_identifier in hits), client_identifier) for client_identifier in client_identifiers]
+    cursor = conn.executemany(
+        """
+        UPDATE KycRefreshData SET screening_agent_status = ?1
+        WHERE client_identifier = ?2 AND screening_agent_status IS NOT ?1
+        """,
+        statuses,
+    )
+    return cursor.rowcount
+
+
+def screen_parties(conn, client_identifiers, threshold=MATCH_THRESHOLD):
+    """Match the current parties of the clients against the watchlist without writing anything.
+
+    Returns (keyed parties, matches), or None when the watchlist is empty.
+    """
+    index = WATCHLIST_INDEX.get(conn)
+    if index is None:
+        return None
+    parties = keyed_parties(conn, client_identifiers)
+    matches = index.screen(parties, threshold)
+    matches['screened_at'] = time.time()
+    return parties, matches
+
+
+def store_screening(conn, client_identifiers, parties, matches):
+    """Replace the stored party keys and matches of the clients and update their screening_agent_status."""
+    store_party_keys(conn, client_identifiers, parties)
+    conn.executemany(
+        f"DELETE FROM {MATCH_TABLE} WHERE client_identifier = ?",
+        [(str(client_identifier),) for client_identifier in client_identifiers],
+    )
+    insert_rows(conn, MATCH_TABLE, matches)
+    update_screening_status(conn, client_identifiers)
+
+
+def screen_clients(client_identifiers=None, db_path=DB_PATH, threshold=MATCH_THRESHOLD):
+    """Screen the parties of the clients (default: the whole book), store and return their matches.
+
+    The screening_agent_status of the screened clients is updated to match. Returns None when
+    the watchlist is empty, so callers can fall back to the screening tool.
+    """
+    with sqlite3.connect(db_path) as conn:
+        if client_identifiers is not None:
+            screened = screen_parties(conn, client_identifiers, threshold)
+            if screened is None:
+                return None
+            store_screening(conn, client_identifiers, *screened)
+            return screened[1]
+
+        index = WATCHLIST_INDEX.get(conn)
+        if index is None:
+            return None
+        sync_party_keys(conn)
+        matches = index.screen(load_party_keys(conn), threshold)
+        matches['screened_at'] = time.time()
+        conn.execute(f"DELETE FROM {MATCH_TABLE}")
+        matches.to_sql(MATCH_TABLE, conn, if_exists='append', index=False)
+        update_screening_status(conn, [row[0] for row in conn.execute("SELECT DISTINCT client_identifier FROM KycRefreshData")])
+    return matches
+
+
+def apply_watchlist_delta(added, removed, list_name, db_path=DB_PATH, threshold=MATCH_THRESHOLD):
+    """Apply a watchlist delta and re-screen only the parties it affects.
+
+    `added` is a frame of new entries (as read by import_watchlist) and `removed` the names of
+    entries of `list_name` to drop. Matches of the removed entries are deleted, each added entry
+    is matched against PARTY_INDEX, and screening_agent_status is recomputed for the clients that
+    gained or lost a match. Returns (new matches, number of refresh rows whose status changed).
+    """
+    now = time.time()
+    with sqlite3.connect(db_path) as conn:
+        party_index = PARTY_INDEX.get(conn)
+        affected = set()
+        for name in removed:
+            for (watchlist_id,) in conn.execute(
+                f"DELETE FROM {WATCHLIST_TABLE} WHERE list_name = ? AND name = ? RETURNING id", (list_name, name)
+            ).fetchall():
+                affected.update(row[0] for row in conn.execute(
+                    f"DELETE FROM {MATCH_TABLE} WHERE watchlist_id = ? RETURNING client_identifier", (watchlist_id,)
+                ).fetchall())
+
+        hits = []
+        for entry in watchlist_entries(added, list_name, now).itertuples(index=False):
+            watchlist_id = conn.execute(
+                f"""
+                INSERT INTO {WATCHLIST_TABLE} (list_name, category, name, details, updated_at, name_key, phonetic_key)
+                VALUES (?, ?, ?, ?, ?, ?, ?) RETURNING id
+                """,
+                (entry.list_name, entry.category, entry.name, entry.details, entry.updated_at,
+                 entry.name_key, entry.phonetic_key),
+            ).fetchone()[0]
+            if party_index is None or not entry.name_key:
+                continue
+            for position, score in party_index.match(entry.name_key, entry.phonetic_key, threshold):
+                party = party_index.entries.iloc[position]
+                hits.append((
+                    party['client_identifier'], party['party_role'], party['party_name'],
+                    watchlist_id, entry.name, entry.list_name, entry.category, score,
+                ))
+        matches = pd.DataFrame(hits, columns=MATCH_COLUMNS)
+        matches['screened_at'] = now
+        matches.to_sql(MATCH_TABLE, conn, if_exists='append', index=False)
+
+        affected.update(matches['client_identifier'])
+        updated = update_screening_status(conn, affected)
+    return matches, updated
+
+
+def format_matches(matches):
+    """Plain text list of matches for the screening agent's prompt."""
+    if matches.empty:
+        return "No watchlist matches."
+    return "\n".join(
+        f"{row.party_role} '{row.party_name}' matches '{row.watchlist_name}' "
+        f"({row.list_name if pd.notna(row.list_name) else 'watchlist'}, "
+        f"{row.category if pd.notna(row.category) else 'uncategorized'}), similarity {row.score:.2f}"
+        for row in matches.itertuples()
+    )
+
+
+def read_screening(client_identifier, db_path):
+    with sqlite3.connect(db_path) as conn:
+        return screen_parties(conn, [client_identifier])
+
+
+async def screening_summary(client_identifier, db_path=DB_PATH):
+    """Screen one client and return its matches as prompt text, or None when local screening is unavailable.
+
+    Matching runs in a worker thread; the results are stored through the workflow's database writer.
+    """
+    try:
+        screened = await asyncio.to_thread(read_screening, client_identifier, db_path)
+        if screened is None:
+            return None
+        await db_writer.write(db_path, store_screening, [client_identifier], *screened)
+    except Exception as e:
+        print(f"Warning: Local screening failed for client {client_identifier}: {e}")
+        return None
+    return format_matches(screened[1])
+
+
+def watchlist_entries(df, list_name, updated_at):
+    """ScreeningWatchlist rows, with their name keys, for a frame with a 'name' column and optionally 'category'.
+
+    The other columns of a row are kept as JSON in 'details'.
+    """
+    entries = pd.DataFrame({
+        'list_name': list_name,
+        'category': df['category'] if 'category' in df.columns else None,
+        'name': df['name'],
+        'details': df.drop(columns=['name', 'category'], errors='ignore').apply(
+            lambda row: row.dropna().to_json(), axis=1
+        ) if len(df.columns) > 1 else None,
+        'updated_at': updated_at,
+    }, index=df.index)
+    entries = entries[entries['name'].notna()]
+    return entries.join(name_keys(entries['name']))
+
+
+def import_watchlist(csv_path, list_name, db_path=DB_PATH):
+    """Replace the entries of one list with the rows of a CSV; returns the number of entries imported."""
+    entries = watchlist_entries(pd.read_csv(csv_path, dtype=str), list_name, time.time())
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(f"DELETE FROM {WATCHLIST_TABLE} WHERE list_name = ?", (list_name,))
+        entries.to_sql(WATCHLIST_TABLE, conn, if_exists='append', index=False)
+    return len(entries)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Screen client and member names against the local watchlist")
+    parser.add_argument("client_identifiers", nargs="*", help="clients to screen (defaults to the whole book)")
+    parser.add_argument("--import-csv", help="CSV of watchlist entries to load before screening")
+    parser.add_argument("--list-name", default="watchlist", help="list the imported entries belong to")
+    parser.add_argument("--delta-added", help="CSV of entries added to the list; only affected parties are re-screened")
+    parser.add_argument("--delta-removed", help="CSV with a 'name' column of entries removed from the list")
+    parser.add_argument("--threshold", type=float, default=MATCH_THRESHOLD, help="minimum similarity of a match")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    migrate(DB_PATH)
+    args = parse_args()
+    if args.import_csv:
+        print(f"Imported {import_watchlist(args.import_csv, args.list_name)} entries into {args.list_name}")
+    with sqlite3.connect(DB_PATH) as conn:
+        keyed = store_watchlist_keys(conn)
+    if keyed:
+        print(f"Stored the name keys of {keyed} watchlist entries inserted without them")
+    t0 = time.time()
+    if args.delta_added or args.delta_removed:
+        added = pd.read_csv(args.delta_added, dtype=str) if args.delta_added else pd.DataFrame(columns=['name'])
+        removed = pd.read_csv(args.delta_removed, dtype=str)['name'].dropna() if args.delta_removed else []
+        matches, updated = apply_watchlist_delta(added, removed, args.list_name, threshold=args.threshold)
+        print(matches.to_string(index=False))
+        print(f"\n{len(matches)} new matches, {updated} refresh rows updated in {time.time() - t0:.2f} sec")
+    else:
+        matches = screen_clients(args.client_identifiers or None, threshold=args.threshold)
+        if matches is None:
+            print("The watchlist is empty; import one with --import-csv")
+        else:
+            print(matches.to_string(index=False))
+            print(f"\n{len(matches)} matches in {time.time() - t0:.2f} sec")
@@ -14,6 +14,16 @@ msg2 = (
 
 SCREENING2 = f"""{msg2}"""
 
+# Step 6 when the names were already screened locally (screening_engine); the matches follow in <matches> tags
+msg2_local = (
+    "The client and member names were already checked against the watchlist by the local screening engine; "
+    "do not call the screening tool for them again. Using the matches below, "
+    "return a clear, plain English summary of any matches, or state that there are none. "
+    "Avoid extra formatting, debug info, or XML. Only include relevant screening results."
+)
+
+SCREENING2_LOCAL = f"""{msg2_local}"""
+
 msg3 = "Extract individually client and member name and pass it in screening tool (person_info) to identify negative news."
 
 SCREENING3 = f"""{msg3}"""
\ No newline at end of file
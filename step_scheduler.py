@@ -0,0 +1,52 @@
+"""Dependency-aware scheduler for the steps of a KYC workflow."""
+
+import asyncio
+
+
+class WorkflowStep:
+    """A named workflow step that runs once all the steps it depends on have finished.
+
+    `func` is called with the results of `depends_on`, in order, and must return an awaitable.
+    """
+
+    def __init__(self, name, func, depends_on=()):
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+
+
+async def run_step_graph(steps):
+    """Run workflow steps as a DAG and return their results keyed by step name.
+
+    Steps must be listed so that every dependency appears before the steps that use it.
+    Independent steps run concurrently; if any step fails the remaining ones are cancelled
+    and the error is raised.
+    """
+    # Validate the whole graph first, so a bad step never leaves earlier ones running unowned
+    seen = set()
+    for step in steps:
+        missing = [name for name in step.depends_on if name not in seen]
+        if missing:
+            raise ValueError(f"Step '{step.name}' depends on unknown or later steps: {missing}")
+        seen.add(step.name)
+
+    tasks = {}
+
+    async def run(step, dependencies):
+        inputs = [await task for task in dependencies]
+        return await step.func(*inputs)
+
+    for step in steps:
+        tasks[step.name] = asyncio.ensure_future(
+            run(step, [tasks[name] for name in step.depends_on])
+        )
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+
+    return {name: task.result() for name, task in tasks.items()}
@@ -0,0 +1,127 @@
+"""Typed outputs of the agent steps whose answers are written to the database.
+
+The agent is cloned with the model as its `output_type`, so the SDK requests a JSON schema
+constrained response and validates it. An answer that still fails validation (or a cached
+free-text answer from before) gets one repair turn quoting the validation errors; no regex
+scraping of the output is involved.
+"""
+
+from functools import partial
+from typing import Any, Dict, Literal
+
+from agents import AgentOutputSchema, ModelBehaviorError
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, ValidationError
+
+from llm_cache import cached_run
+
+# Characters of the validation errors quoted in the repair prompt
+REPAIR_ERROR_CHARS = 1000
+
+
+class AnalystUpdate(BaseModel):
+    """Analyst agent answer: the columns to write for one client."""
+
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    client_identifier: str
+    update_dict: Dict[str, Any] = Field(description="KycRefreshData column -> new value")
+
+
+class FinalReport(BaseModel):
+    """Orchestrator's final summary of a KYC review; the aliases are the keys of the original prompt."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    material_changes: int = Field(validation_alias=AliasChoices("material_changes", "No. of material changes"))
+    non_material_changes: int = Field(
+        validation_alias=AliasChoices("non_material_changes", "No. of non material changes")
+    )
+    researcher_agent_used: Literal[0, 1] = Field(
+        validation_alias=AliasChoices("researcher_agent_used", "Researcher agent used")
+    )
+    outreach_agent_required: Literal[0, 1] = Field(
+        description="1 if information is incomplete and the outreach agent is required",
+        validation_alias=AliasChoices("outreach_agent_required", "Outreach agent required"),
+    )
+    analyst_agent_invoked: Literal[0, 1] = Field(
+        description="1 if data was updated in the database",
+        validation_alias=AliasChoices("analyst_agent_invoked", "Analyst agent invoked"),
+    )
+    screening_hit: Literal[0, 1] = Field(validation_alias=AliasChoices("screening_hit", "Screening hit"))
+    adverse_media_search: str = Field(
+        description="Names of the persons with an identified negative profile, or an empty string",
+        validation_alias=AliasChoices("adverse_media_search", "Adverse Media Search"),
+    )
+
+
+# update_dict has free-form keys, which the strict JSON schema mode does not allow
+OUTPUT_SCHEMAS = {
+    AnalystUpdate: AgentOutputSchema(AnalystUpdate, strict_json_schema=False),
+    FinalReport: AgentOutputSchema(FinalReport),
+}
+
+
+def parse_output(output, model):
+    """Validate an agent output (model instance, dict from the cache or JSON text) as `model`."""
+    if isinstance(output, model):
+        return output
+    if isinstance(output, dict):
+        return model.model_validate(output)
+    return model.model_validate_json(output if isinstance(output, (str, bytes)) else str(output))
+
+
+class InvalidOutputResult:
+    """Stand-in Runner result of a step whose answer never validated: the step input and the error."""
+
+    def __init__(self, final_output, input_list):
+        self.final_output = final_output
+        self._input_list = input_list
+
+    def to_input_list(self):
+        return list(self._input_list)
+
+
+def repair_message(model, error):
+    return {
+        "content": (
+            f"Your previous answer was not a valid {model.__name__} object: {str(error)[:REPAIR_ERROR_CHARS]}\n"
+            "Return only the corrected JSON object."
+        ),
+        "role": "user",
+    }
+
+
+async def run_structured(agent, prompt_name, input, model):
+    """Run a step with `model` as the agent's output type; return (result, parsed output or None).
+
+    An invalid answer is retried once with the validation errors; if the repaired answer is
+    still invalid the parsed output is None and the step is skipped rather than failed. The
+    result's final_output is the parsed object as JSON text, so the conversation, checkpoints
+    and evaluation see a plain string. Only valid answers are cached.
+    """
+    structured_agent = agent.clone(output_type=OUTPUT_SCHEMAS[model])
+    prompt_name = f"{prompt_name}:{model.__name__}"
+    validate = partial(parse_output, model=model)
+    try:
+        result = await cached_run(structured_agent, prompt_name, input=input, validate=validate)
+        parsed = parse_output(result.final_output, model)
+        return with_parsed_output(result, parsed), parsed
+    except (ModelBehaviorError, ValidationError) as e:
+        print(f"Warning: {prompt_name} answer failed validation, asking for a repair: {e}")
+        error = e
+        previous = result.to_input_list() if isinstance(e, ValidationError) else input
+
+    try:
+        result = await cached_run(
+            structured_agent, f"{prompt_name}:REPAIR", input=previous + [repair_message(model, error)], validate=validate
+        )
+        parsed = parse_output(result.final_output, model)
+    except (ModelBehaviorError, ValidationError) as e:
+        print(f"Warning: Repaired {prompt_name} answer is still invalid: {e}")
+        return InvalidOutputResult(f"No valid {model.__name__}: {e}", input), None
+    return with_parsed_output(result, parsed), parsed
+
+
+def with_parsed_output(result, parsed):
+    result.final_output = parsed.model_dump_json()
+    return result
@@ -0,0 +1,77 @@
+"""Durable per-step checkpoints so an interrupted KYC workflow can resume where it stopped.
+
+The writes take a connection, so the workflow can run them on its database writer (see db_writer).
+"""
+
+import json
+import sqlite3
+import time
+
+from utils.config import DB_PATH
+
+CHECKPOINT_TABLE = "WorkflowCheckpoint"
+
+
+class CheckpointResult:
+    """Step result restored from a checkpoint, exposing the Runner result interface used by the workflow."""
+
+    def __init__(self, final_output, input_list, update_data=None, step_summaries=None):
+        self.final_output = final_output
+        self._input_list = input_list
+        self.update_data = update_data
+        self.step_summaries = step_summaries or {}
+
+    def to_input_list(self):
+        return list(self._input_list)
+
+
+def discard_stale_checkpoints(conn, client_identifier, fingerprint):
+    """Delete checkpoints written against different client data (another fingerprint)."""
+    conn.execute(
+        f"DELETE FROM {CHECKPOINT_TABLE} WHERE client_identifier = ? AND data_fingerprint != ?",
+        (str(client_identifier), fingerprint),
+    )
+
+
+def load_checkpoints(client_identifier, fingerprint):
+    """Return the completed steps of an interrupted run on the same client data as {step: CheckpointResult}."""
+    with sqlite3.connect(DB_PATH) as conn:
+        rows = conn.execute(
+            f"""
+            SELECT step, final_output, input_list, update_data, step_summaries
+            FROM {CHECKPOINT_TABLE}
+            WHERE client_identifier = ? AND data_fingerprint = ?
+            """,
+            (str(client_identifier), fingerprint),
+        ).fetchall()
+    return {
+        step: CheckpointResult(
+            json.loads(final_output),
+            json.loads(input_list),
+            json.loads(update_data),
+            json.loads(step_summaries),
+        )
+        for step, final_output, input_list, update_data, step_summaries in rows
+    }
+
+
+def save_checkpoint(conn, client_identifier, step, fingerprint, result):
+    """Persist the result of a completed step."""
+    conn.execute(
+        f"INSERT OR REPLACE INTO {CHECKPOINT_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            str(client_identifier),
+            step,
+            fingerprint,
+            json.dumps(getattr(result, "final_output", None), default=str),
+            json.dumps(result.to_input_list(), default=str),
+            json.dumps(getattr(result, "update_data", None), default=str),
+            json.dumps(getattr(result, "step_summaries", None) or {}, default=str),
+            time.time(),
+        ),
+    )
+
+
+def clear_checkpoints(conn, client_identifier):
+    """Remove the checkpoints of a client once its workflow has completed."""
+    conn.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE client_identifier = ?", (str(client_identifier),))